@@ -0,0 +1,535 @@
+"""
+Teste de carga do chat: como o MeuBot e o monitorar_chat_youtube se comportam
+durante uma raid (milhares de espectadores mandando mensagens ao mesmo tempo).
+
+Roda sem rede: o Gemini é um cliente falso com latência configurável, a
+Twitch é substituída por mensagens/contextos falsos entregues direto ao
+event_message do bot (cada mensagem vira uma task, como no twitchio) e o
+YouTube conversa com um servidor HTTP local que imita a YouTube Data API
+(videos.list, liveChatMessages.list/insert). O chat é sintético ou lido de um
+arquivo gravado e é reproduzido a N mensagens/s.
+
+Relatório por plataforma: vazão de entrada alcançada, atraso de injeção (o
+event loop bloqueado atrasa até a chegada das mensagens), latência p50/p95/p99
+da resposta final de cada comando, comandos sem resposta (descartados) e
+memória (RSS). Sai com código 1 se um orçamento (--max-p95-ms, --max-descartes)
+for estourado, para uso no CI.
+
+Precisa das dependências do requirements.txt instaladas (twitchio,
+google-api-python-client), mas não de credenciais nem de acesso à internet.
+
+Uso: python -m benchmarks.bench_chat_load [--plataforma twitch|youtube|ambas] [--taxa 200] [--duracao 30]
+         [--espectadores 5000] [--fracao-comandos 0.05] [--gemini lognormal:800,0.5] [--arquivo chat.jsonl]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+PERGUNTAS = [
+    "qual o maior planeta?", "quem ganhou a copa de 2002?", "quanto é 7 vezes 8?",
+    "qual a capital da Austrália?", "por que o céu é azul?", "qual a melhor classe do WoW?",
+]
+RESPOSTA_GEMINI = "Júpiter é o maior planeta do Sistema Solar, com mais de 300 vezes a massa da Terra."
+
+
+# ---- latências e Gemini falso ----
+
+def parse_distribuicao(spec, rng=random):
+    """
+    Converte "fixo:500", "uniforme:200,1500", "lognormal:800,0.5" (mediana em
+    ms, sigma) ou "exponencial:800" (média em ms) em uma função que sorteia
+    uma latência em segundos.
+    """
+    nome, _, parametros = spec.partition(":")
+    try:
+        valores = [float(valor) for valor in parametros.split(",") if valor]
+        if nome == "fixo":
+            return lambda: valores[0] / 1000
+        if nome == "uniforme":
+            return lambda: rng.uniform(valores[0], valores[1]) / 1000
+        if nome == "lognormal":
+            mu, sigma = math.log(valores[0]), valores[1] if len(valores) > 1 else 0.5
+            return lambda: rng.lognormvariate(mu, sigma) / 1000
+        if nome == "exponencial":
+            return lambda: rng.expovariate(1 / valores[0]) / 1000
+    except (IndexError, ValueError, ZeroDivisionError):
+        pass
+    raise argparse.ArgumentTypeError(f"distribuição inválida: {spec}")
+
+
+class FakeGemini:
+    """Substitui o GenerativeModel: generate_content() bloqueia como o cliente real."""
+
+    def __init__(self, latencia, taxa_falhas=0.0, rng=random):
+        self.latencia = latencia
+        self.taxa_falhas = taxa_falhas
+        self.rng = rng
+        self.chamadas = 0
+
+    def generate_content(self, prompt):
+        self.chamadas += 1
+        time.sleep(self.latencia())
+        if self.taxa_falhas and self.rng.random() < self.taxa_falhas:
+            raise RuntimeError("503 The model is overloaded")
+        return SimpleNamespace(text=RESPOSTA_GEMINI)
+
+
+# ---- chat sintético ou gravado ----
+
+def gerar_chat(espectadores, fracao_comandos, comandos, rng):
+    """Gera (autor, texto) infinitamente; os autores são sorteados entre os espectadores da raid."""
+    i = 0
+    while True:
+        autor = f"viewer_{rng.randrange(espectadores)}"
+        if rng.random() < fracao_comandos:
+            comando = rng.choice(comandos)
+            texto = f"!{comando} {rng.choice(PERGUNTAS)}" if comando == "pergunta" else f"!{comando}"
+        else:
+            texto = f"mensagem comum número {i} PogChamp"
+        i += 1
+        yield autor, texto
+
+
+def ler_chat_gravado(caminho):
+    """
+    Lê um chat gravado, repetido em ciclo: uma mensagem por linha, em JSON
+    ({"author": ..., "content": ...}) ou no formato "autor: mensagem".
+    """
+    mensagens = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha:
+                continue
+            if linha.startswith("{"):
+                dados = json.loads(linha)
+                mensagens.append((dados["author"], dados["content"]))
+            else:
+                autor, _, texto = linha.partition(":")
+                mensagens.append((autor.strip(), texto.strip()))
+    if not mensagens:
+        raise ValueError(f"nenhuma mensagem em {caminho}")
+    while True:
+        yield from mensagens
+
+
+# ---- resultados ----
+
+class Resultado:
+    """Registra mensagens injetadas e respostas de uma plataforma."""
+
+    def __init__(self, plataforma):
+        self.plataforma = plataforma
+        # Comandos que a plataforma responde (None: todos); os outros não contam como descartados
+        self.com_resposta = None
+        self.mensagens = 0
+        self.comandos = 0
+        self.atrasos_injecao = []
+        # autor -> fila de instantes de envio dos comandos ainda sem resposta
+        self.pendentes = defaultdict(deque)
+        self.latencias = []
+        self.respostas = 0
+        self.nao_lidas = 0
+        self.inicio = None
+        self.fim_injecao = None
+        self._lock = threading.Lock()
+
+    def injetada(self, autor, texto, agendada):
+        agora = time.perf_counter()
+        self.mensagens += 1
+        self.atrasos_injecao.append(agora - agendada)
+        comando = texto[1:].split(" ", 1)[0].lower() if texto.startswith("!") else None
+        if comando and (self.com_resposta is None or comando in self.com_resposta):
+            self.comandos += 1
+            with self._lock:
+                self.pendentes[autor].append(agora)
+        return agora
+
+    def respondida(self, autor, final=True):
+        """Uma resposta ao comando mais antigo do autor; só a final encerra o comando."""
+        agora = time.perf_counter()
+        with self._lock:
+            self.respostas += 1
+            fila = self.pendentes.get(autor)
+            if not fila or not final:
+                return
+            self.latencias.append(agora - fila.popleft())
+            if not fila:
+                del self.pendentes[autor]
+
+    def sem_resposta(self):
+        with self._lock:
+            return sum(len(fila) for fila in self.pendentes.values())
+
+
+def percentil(valores, p):
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, math.ceil(p / 100 * len(ordenados)) - 1))]
+
+
+def memoria_mib():
+    """(RSS atual, pico de RSS) do processo em MiB; None onde não houver /proc ou resource."""
+    atual = pico = None
+    try:
+        with open("/proc/self/statm") as statm:
+            atual = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB no Linux
+    except ImportError:
+        pass
+    if atual is not None and pico is not None:
+        pico = max(pico, atual)
+    return atual, pico
+
+
+async def injetar(gerador, taxa, duracao, entregar, resultado):
+    """
+    Entrega as mensagens no ritmo pedido. Se o loop atrasar, as mensagens
+    atrasadas saem de uma vez (como o backlog que o chat real acumula).
+    """
+    resultado.inicio = inicio = time.perf_counter()
+    enviadas = 0
+    while True:
+        agora = time.perf_counter()
+        if agora - inicio >= duracao:
+            break
+        devidas = int((agora - inicio) * taxa)
+        while enviadas < devidas:
+            autor, texto = next(gerador)
+            entregar(autor, texto, inicio + enviadas / taxa)
+            enviadas += 1
+        await asyncio.sleep(min(0.01, 1 / taxa))
+    resultado.fim_injecao = time.perf_counter()
+
+
+# ---- Twitch ----
+
+class FakeChannel:
+    def __init__(self, name, ao_enviar):
+        self.name = name
+        self._ao_enviar = ao_enviar
+
+    async def send(self, content):
+        self._ao_enviar(content)
+
+
+class FakeContext:
+    """O que os comandos do MeuBot usam do commands.Context do twitchio."""
+
+    def __init__(self, message, resultado, final):
+        self.message = message
+        self.author = message.author
+        self.resultado = resultado
+        self._final = final
+        self.channel = FakeChannel(message.channel.name, self._registrar)
+
+    def _registrar(self, content):
+        self.resultado.respondida(self.author.name, final=self._final(content))
+
+    async def send(self, content):
+        self._registrar(content)
+
+
+def _resposta_final(content):
+    # O !pergunta envia "Pensando..." antes da resposta do Gemini
+    return not content.startswith("🤖 Pensando")
+
+
+async def rodar_twitch(args, gemini, resultado):
+    import Bot_Twitch
+
+    Bot_Twitch.TOKEN = "bench"
+    Bot_Twitch.model = gemini
+    bot = Bot_Twitch.MeuBot()
+    # A sincronização com a planilha não faz parte do caminho do chat
+    bot.sheets_sync.stop()
+    resultado.com_resposta = set(bot.commands)
+    canal = SimpleNamespace(name=Bot_Twitch.CANAL)
+    tarefas = set()
+
+    async def despachar(chat_message, argumentos):
+        # Substitui handle_commands (que exige a conexão com a Twitch): chama o comando direto
+        nome, _ = chat_message.parse_command(bot.pipeline.prefix)
+        comando = bot.commands.get(nome)
+        if comando is None:
+            return
+        ctx = FakeContext(chat_message.raw, resultado, _resposta_final)
+        await getattr(comando, "_callback", comando)(bot, ctx)
+
+    bot.pipeline.default_handler = despachar
+
+    def entregar(autor, texto, agendada):
+        resultado.injetada(autor, texto, agendada)
+        usuario = SimpleNamespace(id=autor, name=autor, display_name=autor, is_broadcaster=False,
+                                  is_mod=False, is_subscriber=False)
+        mensagem = SimpleNamespace(id=f"msg-{resultado.mensagens}", author=usuario, content=texto, channel=canal,
+                                   timestamp=datetime.now(timezone.utc), echo=False)
+        # O twitchio despacha cada evento em uma task própria
+        tarefa = asyncio.ensure_future(bot.event_message(mensagem))
+        tarefas.add(tarefa)
+        tarefa.add_done_callback(tarefas.discard)
+
+    await injetar(gerar_entrada(args), args.taxa, args.duracao, entregar, resultado)
+    limite = time.perf_counter() + args.drenagem
+    while (tarefas or resultado.sem_resposta()) and time.perf_counter() < limite:
+        await asyncio.sleep(0.05)
+    for tarefa in list(tarefas):
+        tarefa.cancel()
+    await bot.compare_queue.stop(drain=False)
+    bot.player_store.close()
+
+
+# ---- YouTube ----
+
+class FakeYouTubeAPI(ThreadingHTTPServer):
+    """Servidor local com as rotas da YouTube Data API usadas pelo youtube_hello."""
+
+    daemon_threads = True
+
+    def __init__(self, resultado, intervalo_ms, latencia=None, max_resultados=2000):
+        super().__init__(("127.0.0.1", 0), _YouTubeHandler)
+        self.resultado = resultado
+        self.intervalo_ms = intervalo_ms
+        self.latencia = latencia
+        self.max_resultados = max_resultados
+        self.itens = []
+        self.lidas = 0
+        # Definido na primeira leitura do chat: o monitor já está no ar e o chat pode começar
+        self.pronto = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/youtube/v3/"
+
+    def publicar(self, autor, texto):
+        i = len(self.itens)
+        item = {
+            "id": f"LCC.{i:012d}",
+            "snippet": {"displayMessage": texto, "publishedAt": datetime.now(timezone.utc).isoformat()},
+            "authorDetails": {"channelId": f"UC-{autor}", "displayName": autor, "isChatOwner": False,
+                              "isChatModerator": False, "isChatSponsor": False},
+        }
+        with self._lock:
+            self.itens.append(item)
+
+    def pagina(self, token, max_resultados):
+        self.pronto.set()
+        with self._lock:
+            inicio = int(token) if token else 0
+            fim = min(len(self.itens), inicio + min(max_resultados, self.max_resultados))
+            itens = self.itens[inicio:fim]
+            self.lidas = max(self.lidas, fim)
+        return {"pollingIntervalMillis": self.intervalo_ms, "nextPageToken": str(fim), "items": itens}
+
+    def nao_lidas(self):
+        with self._lock:
+            return len(self.itens) - self.lidas
+
+
+class _YouTubeHandler(BaseHTTPRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, dados):
+        corpo = json.dumps(dados).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _esperar(self):
+        if self.server.latencia is not None:
+            time.sleep(self.server.latencia())
+
+    def do_GET(self):
+        self._esperar()
+        url = urlparse(self.path)
+        parametros = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+        if url.path.endswith("/videos"):
+            self._responder({"items": [{"liveStreamingDetails": {"activeLiveChatId": "bench-chat"}}]})
+        elif url.path.endswith("/liveChat/messages"):
+            self._responder(self.server.pagina(parametros.get("pageToken"),
+                                               int(parametros.get("maxResults", self.server.max_resultados))))
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        self._esperar()
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        texto = corpo.get("snippet", {}).get("textMessageDetails", {}).get("messageText", "")
+        # Respostas com autor saem como "[IA para <autor>] ..." (PERFIL_YOUTUBE)
+        if texto.startswith("[IA para "):
+            self.server.resultado.respondida(texto[len("[IA para "):].split("]", 1)[0])
+        self._responder({"id": f"LCC.reply.{self.server.resultado.respostas}", "snippet": corpo.get("snippet")})
+
+
+def rodar_youtube(args, gemini, resultado):
+    """Executa o monitor real contra a API local; retorna (thread do monitor, servidor, stop_event)."""
+    import httplib2
+    from googleapiclient.discovery import build
+
+    import youtube_hello
+
+    resultado.com_resposta = {"pergunta"}
+    servidor = FakeYouTubeAPI(resultado, args.intervalo_youtube_ms,
+                              parse_distribuicao(args.latencia_youtube) if args.latencia_youtube else None)
+    threading.Thread(target=servidor.serve_forever, name="fake-youtube-api", daemon=True).start()
+
+    os.environ["YOUTUBE_VIDEO_ID"] = "bench-video"
+    youtube_hello.model = gemini
+    if args.intervalo_youtube_ms < youtube_hello.INTERVALO_MINIMO_POLLING * 1000:
+        youtube_hello.INTERVALO_MINIMO_POLLING = args.intervalo_youtube_ms / 1000
+    # Documento de discovery embutido na biblioteca (sem rede) e endpoint apontando para o servidor local
+    youtube_hello.get_youtube_service = lambda: build(
+        "youtube", "v3", http=httplib2.Http(), static_discovery=True, client_options={"api_endpoint": servidor.url})
+
+    stop_event = threading.Event()
+    monitor = threading.Thread(target=youtube_hello.monitorar_chat_youtube, args=(stop_event,),
+                               name="youtube-monitor", daemon=True)
+    monitor.start()
+    return monitor, servidor, stop_event
+
+
+async def alimentar_youtube(args, servidor, resultado):
+    def entregar(autor, texto, agendada):
+        resultado.injetada(autor, texto, agendada)
+        servidor.publicar(autor, texto)
+
+    if not await asyncio.to_thread(servidor.pronto.wait, 30):
+        raise RuntimeError("o monitor do YouTube não leu o chat em 30s")
+    await injetar(gerar_entrada(args), args.taxa, args.duracao, entregar, resultado)
+    limite = time.perf_counter() + args.drenagem
+    while (resultado.sem_resposta() or servidor.nao_lidas()) and time.perf_counter() < limite:
+        await asyncio.sleep(0.1)
+
+
+# ---- execução ----
+
+def gerar_entrada(args):
+    rng = random.Random(args.semente)
+    if args.arquivo:
+        return ler_chat_gravado(args.arquivo)
+    return gerar_chat(args.espectadores, args.fracao_comandos, args.comandos.split(","), rng)
+
+
+async def executar(args, gemini, resultados):
+    tarefas = []
+    monitor = None
+    if "youtube" in resultados:
+        monitor, servidor, stop_event = rodar_youtube(args, gemini, resultados["youtube"])
+        # Loop próprio: o chat do YouTube não deve atrasar quando o event loop da Twitch bloqueia
+        tarefas.append(asyncio.to_thread(asyncio.run, alimentar_youtube(args, servidor, resultados["youtube"])))
+    if "twitch" in resultados:
+        tarefas.append(rodar_twitch(args, gemini, resultados["twitch"]))
+    await asyncio.gather(*tarefas)
+    if monitor is not None:
+        resultados["youtube"].nao_lidas = servidor.nao_lidas()
+        stop_event.set()
+        monitor.join(args.drenagem)
+        servidor.shutdown()
+
+
+def relatorio(resultado, args):
+    duracao = (resultado.fim_injecao or time.perf_counter()) - (resultado.inicio or time.perf_counter())
+    latencias = [valor * 1000 for valor in resultado.latencias]
+    atrasos = [valor * 1000 for valor in resultado.atrasos_injecao]
+    descartes = resultado.sem_resposta()
+    print(f"\n== {resultado.plataforma} ==")
+    print(f"  entrada     : {resultado.mensagens} mensagens em {duracao:.1f}s "
+          f"({resultado.mensagens / duracao if duracao else 0:,.0f}/s de {args.taxa:,.0f}/s pedidas), "
+          f"{resultado.comandos} comandos")
+    print(f"  injeção     : atraso p95 {percentil(atrasos, 95):8.1f} ms, máx {max(atrasos, default=0):8.1f} ms")
+    print(f"  respostas   : {len(latencias)} comandos respondidos, {resultado.respostas} mensagens enviadas")
+    print(f"  latência    : p50 {percentil(latencias, 50):8.1f} ms  p95 {percentil(latencias, 95):8.1f} ms  "
+          f"p99 {percentil(latencias, 99):8.1f} ms")
+    print(f"  descartados : {descartes} comandos sem resposta"
+          + (f" ({resultado.nao_lidas} mensagens nunca lidas)" if resultado.nao_lidas else ""))
+    return percentil(latencias, 95), descartes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do chat (Twitch e YouTube) sem rede")
+    parser.add_argument("--plataforma", choices=("twitch", "youtube", "ambas"), default="twitch")
+    parser.add_argument("--taxa", type=float, default=200, help="mensagens por segundo (por plataforma)")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de chat")
+    parser.add_argument("--drenagem", type=float, default=60,
+                        help="segundos esperando as respostas pendentes depois do fim do chat")
+    parser.add_argument("--espectadores", type=int, default=5000)
+    parser.add_argument("--fracao-comandos", type=float, default=0.05)
+    parser.add_argument("--comandos", default="pergunta,teste",
+                        help="comandos sorteados (o !compare depende da Blizzard e não é simulado)")
+    parser.add_argument("--arquivo", help="chat gravado (JSON por linha ou 'autor: mensagem')")
+    parser.add_argument("--gemini", type=parse_distribuicao, default="lognormal:800,0.5",
+                        help="latência do Gemini: fixo:ms, uniforme:a,b, lognormal:mediana,sigma ou exponencial:média")
+    parser.add_argument("--falhas-gemini", type=float, default=0.0, help="fração das chamadas ao Gemini que falham")
+    parser.add_argument("--intervalo-youtube-ms", type=int, default=5000,
+                        help="pollingIntervalMillis devolvido pela API local")
+    parser.add_argument("--latencia-youtube", help="latência de cada chamada à API local (mesmo formato de --gemini)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--max-p95-ms", type=float, help="orçamento de latência p95 (sai com código 1 se estourar)")
+    parser.add_argument("--max-descartes", type=int, help="máximo de comandos sem resposta")
+    parser.add_argument("--verboso", action="store_true", help="mostra os prints e logs dos bots")
+    args = parser.parse_args()
+
+    plataformas = ("twitch", "youtube") if args.plataforma == "ambas" else (args.plataforma,)
+    resultados = {plataforma: Resultado(plataforma) for plataforma in plataformas}
+    gemini = FakeGemini(args.gemini, args.falhas_gemini, random.Random(args.semente))
+
+    # Banco de jogadores e estado descartáveis; sem credenciais, os bots não tentam se conectar a nada
+    # (vazias em vez de removidas: o load_dotenv dos bots não sobrescreve variáveis já definidas)
+    diretorio = tempfile.mkdtemp(prefix="bench_chat_load_")
+    os.environ["PLAYER_STORE_PATH"] = os.path.join(diretorio, "player_store.db")
+    os.environ["STATE_STORE_PATH"] = os.path.join(diretorio, "state.db")
+    for variavel in ("TWITCH_REFRESH_TOKEN", "GEMINI_API_KEY"):
+        os.environ[variavel] = ""
+
+    rss_inicial, _ = memoria_mib()
+    saida = contextlib.nullcontext() if args.verboso else contextlib.redirect_stdout(io.StringIO())
+    if not args.verboso:
+        logging.disable(logging.CRITICAL)
+    with saida:
+        asyncio.run(executar(args, gemini, resultados))
+    logging.disable(logging.NOTSET)
+    rss_final, rss_pico = memoria_mib()
+
+    estourou = False
+    for resultado in resultados.values():
+        p95, descartes = relatorio(resultado, args)
+        if args.max_p95_ms is not None and not p95 <= args.max_p95_ms:
+            estourou = True
+        if args.max_descartes is not None and descartes > args.max_descartes:
+            estourou = True
+    print(f"\nGemini: {gemini.chamadas} chamadas")
+    if rss_final is not None:
+        print(f"Memória: RSS {rss_inicial:.1f} -> {rss_final:.1f} MiB"
+              + (f" (pico {rss_pico:.1f} MiB)" if rss_pico else ""))
+
+    if estourou:
+        print("❌ Orçamento estourado")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
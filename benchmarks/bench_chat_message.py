@@ -0,0 +1,107 @@
+"""
+Benchmark de memória e throughput do modelo normalizado de mensagens (chat_message).
+
+Compara manter 100k itens crus do YouTube (dicts aninhados) com manter 100k
+ChatMessage, e mede a vazão da conversão + pipeline para as duas plataformas.
+
+Uso: python -m benchmarks.bench_chat_message [--mensagens 100000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+from chat_message import ChatPipeline, from_twitch, from_youtube
+
+
+def gerar_itens_youtube(quantidade):
+    """Gera itens no formato retornado por liveChatMessages().list()."""
+    itens = []
+    for i in range(quantidade):
+        texto = "!pergunta qual o maior planeta?" if i % 10 == 0 else f"mensagem comum número {i}"
+        itens.append({
+            "kind": "youtube#liveChatMessage",
+            "etag": f"etag-{i}",
+            "id": f"LCC.{i:012d}",
+            "snippet": {
+                "type": "textMessageEvent",
+                "liveChatId": "Cg0KC2FiY2RlZmdoaWpr",
+                "authorChannelId": f"UC{i % 5000:022d}",
+                "publishedAt": "2025-05-07T21:15:30.123456+00:00",
+                "hasDisplayContent": True,
+                "displayMessage": texto,
+                "textMessageDetails": {"messageText": texto},
+            },
+            "authorDetails": {
+                "channelId": f"UC{i % 5000:022d}",
+                "channelUrl": f"http://www.youtube.com/channel/UC{i % 5000:022d}",
+                "displayName": f"viewer_{i % 5000}",
+                "profileImageUrl": "https://yt3.ggpht.com/a/default-user=s88-c-k-c0x00ffffff-no-rj",
+                "isVerified": False,
+                "isChatOwner": False,
+                "isChatSponsor": i % 7 == 0,
+                "isChatModerator": i % 50 == 0,
+            },
+        })
+    return itens
+
+
+def gerar_mensagens_twitch(quantidade):
+    """Gera objetos com os atributos usados das mensagens do twitchio."""
+    agora = datetime.now(timezone.utc)
+    mensagens = []
+    for i in range(quantidade):
+        autor = SimpleNamespace(id=str(i % 5000), name=f"viewer_{i % 5000}", display_name=f"Viewer_{i % 5000}",
+                                is_broadcaster=False, is_mod=i % 50 == 0, is_subscriber=i % 7 == 0)
+        texto = "!pergunta qual o maior planeta?" if i % 10 == 0 else f"mensagem comum número {i}"
+        mensagens.append(SimpleNamespace(id=f"msg-{i}", author=autor, content=texto, timestamp=agora, echo=False))
+    return mensagens
+
+
+def medir_memoria(construir):
+    """Retorna (objeto, bytes alocados) para a construção de um objeto."""
+    gc.collect()
+    tracemalloc.start()
+    objeto = construir()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objeto, atual
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do modelo ChatMessage")
+    parser.add_argument("--mensagens", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.mensagens
+
+    itens, bytes_dicts = medir_memoria(lambda: gerar_itens_youtube(n))
+    _, bytes_chat = medir_memoria(lambda: [from_youtube(item) for item in itens])
+    print(f"Memória para {n} mensagens:")
+    print(f"  dicts do YouTube : {bytes_dicts / 1024 / 1024:8.2f} MiB")
+    print(f"  ChatMessage      : {bytes_chat / 1024 / 1024:8.2f} MiB ({bytes_chat / n:.0f} B/mensagem)")
+
+    comandos = 0
+
+    def handler(mensagem, argumentos):
+        nonlocal comandos
+        comandos += 1
+
+    for nome, entradas, converter in (
+        ("youtube", itens, from_youtube),
+        ("twitch", gerar_mensagens_twitch(n), from_twitch),
+    ):
+        pipeline = ChatPipeline(prefix="!")
+        pipeline.command("pergunta")(handler)
+        comandos = 0
+        inicio = time.perf_counter()
+        for entrada in entradas:
+            pipeline.process(converter(entrada))
+        duracao = time.perf_counter() - inicio
+        print(f"Throughput {nome:8s}: {n / duracao:12,.0f} mensagens/s "
+              f"({duracao * 1e6 / n:.2f} µs/mensagem, {comandos} comandos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark de memória do índice de percentis (percentile_index).
+
+Carrega uma base sintética maior que `sketch_threshold` e depois a mesma
+quantidade de jogadores de novo, medindo com tracemalloc quanto o índice
+cresce por jogador com valores exatos e depois da conversão para sketches.
+Acima do limite, as métricas e as partições por classe/especialização devem
+guardar no máximo `top_capacity` valores exatos cada: sai com código 1 se os
+valores exatos continuarem crescendo com a base.
+
+Uso: python -m benchmarks.bench_percentile_index [--jogadores 50000] [--limite 20000] [--top 1000]
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from percentile_index import PercentileIndex
+from wow_comparative import PERCENTILE_METRICS
+
+# As mesmas métricas do índice do bot (open_percentile_index), para medir o layout de produção
+METRICAS = list(PERCENTILE_METRICS)
+CLASSES = {
+    "Mage": ["Arcane", "Fire", "Frost"], "Warrior": ["Arms", "Fury", "Protection"],
+    "Priest": ["Discipline", "Holy", "Shadow"], "Druid": ["Balance", "Feral", "Guardian", "Restoration"],
+    "Hunter": ["Beast Mastery", "Marksmanship", "Survival"], "Rogue": ["Assassination", "Outlaw", "Subtlety"],
+}
+
+
+def gerar_jogadores(inicio, quantidade, rng):
+    """Gera (key, record) no formato de PlayerStore.rows()."""
+    for i in range(inicio, inicio + quantidade):
+        classe = rng.choice(list(CLASSES))
+        record = {"Character Name": f"Jogador{i}", "Realm": "Azralon", "Class": classe,
+                  "Specialization": rng.choice(CLASSES[classe])}
+        for metrica in METRICAS:
+            record[metrica] = round(rng.lognormvariate(8, 1), 1)
+        yield f"jogador{i}_azralon", record
+
+
+def medir(index, jogadores):
+    """Bytes alocados por update_many()."""
+    gc.collect()
+    antes, _ = tracemalloc.get_traced_memory()
+    inicio = time.perf_counter()
+    index.update_many(jogadores)
+    duracao = time.perf_counter() - inicio
+    depois, _ = tracemalloc.get_traced_memory()
+    return depois - antes, duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória do índice de percentis")
+    parser.add_argument("--jogadores", type=int, default=50000, help="jogadores por etapa (duas etapas)")
+    parser.add_argument("--limite", type=int, default=20000, help="sketch_threshold")
+    parser.add_argument("--top", type=int, default=1000, help="top_capacity")
+    args = parser.parse_args()
+    n = args.jogadores
+
+    tracemalloc.start()
+    falhou = False
+    for nome, limite in (("exato", 10 ** 12), ("sketch", args.limite)):
+        rng = random.Random(42)
+        index = PercentileIndex(METRICAS, sketch_threshold=limite, top_capacity=args.top)
+        primeira, _ = medir(index, list(gerar_jogadores(0, n, rng)))
+        exatos_antes = index.exact_items()
+        segunda, duracao = medir(index, list(gerar_jogadores(n, n, rng)))
+        exatos_depois = index.exact_items()
+        print(f"{nome:7s}: {primeira / n:7.0f} B/jogador na carga, {segunda / n:7.0f} B/jogador nas "
+              f"atualizações ({n / duracao:,.0f}/s), valores exatos {exatos_antes} -> {exatos_depois}")
+        if nome == "sketch" and n >= args.limite and exatos_depois > exatos_antes:
+            falhou = True
+    tracemalloc.stop()
+
+    if falhou:
+        print("❌ Acima do limite, os valores exatos continuaram crescendo com a base")
+        sys.exit(1)
+    print("✅ Memória das métricas estável acima do limite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark do formatador de respostas sobre saídas realistas do Gemini.
+
+Compara a implementação anterior de youtube_hello.limpar_texto (quatro re.sub
+sem pré-compilação e corte no meio da palavra) com response_formatter.
+
+Uso: python -m benchmarks.bench_response_formatter [--repeticoes 20000]
+"""
+import argparse
+import re
+import time
+
+from response_formatter import PERFIL_TWITCH, PERFIL_YOUTUBE, formatar_resposta
+
+RESPOSTAS_GEMINI = [
+    "Júpiter é o maior planeta do Sistema Solar! 🪐",
+    "**Júpiter** é o maior planeta do Sistema Solar, com um diâmetro de cerca de 143 mil km.\n",
+    (
+        "## Dicas para subir de elo\n\n"
+        "Aqui vão algumas dicas rápidas:\n"
+        "* **Foque em poucos campeões** para dominar as mecânicas.\n"
+        "* Assista aos seus *replays* e anote os erros.\n"
+        "* Cuide do `farm` e da visão do mapa.\n\n"
+        "Com consistência, você vai subir! 💪"
+    ),
+    (
+        "A melhor classe para iniciantes no World of Warcraft costuma ser o **Caçador** "
+        "(Hunter), porque tem dano à distância, um pet que segura o dano e uma rotação "
+        "simples. Outras boas opções são o __Paladino__ e o Guerreiro, que são resistentes "
+        "e perdoam erros de posicionamento. No fim, escolha a classe cuja fantasia você "
+        "mais gosta, já que isso mantém a motivação por mais tempo.\n\n"
+        "1. Caçador\n2. Paladino\n3. Guerreiro"
+    ),
+    "Não sei responder isso com certeza, mas posso tentar ajudar se você der mais detalhes. 😊",
+]
+
+
+def limpar_texto_anterior(texto):
+    """Implementação anterior de youtube_hello.limpar_texto."""
+    texto = re.sub(r'\*\*|\*|__|_|##|#|`', '', texto)
+    texto = re.sub(r'\n\s*\*\s+', '. ', texto)
+    texto = re.sub(r'\n+', ' ', texto)
+    if len(texto) > 150:
+        texto = texto[:147] + "..."
+    return texto
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for resposta in RESPOSTAS_GEMINI:
+            funcao(resposta)
+    return (time.perf_counter() - inicio) / (repeticoes * len(RESPOSTAS_GEMINI)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do formatador de respostas")
+    parser.add_argument("--repeticoes", type=int, default=20000)
+    args = parser.parse_args()
+
+    candidatos = {
+        "limpar_texto anterior": limpar_texto_anterior,
+        "formatador (youtube)": lambda texto: formatar_resposta(texto, PERFIL_YOUTUBE, "viewer_123"),
+        "formatador (twitch)": lambda texto: formatar_resposta(texto, PERFIL_TWITCH),
+    }
+    for nome, funcao in candidatos.items():
+        print(f"{nome:24s}: {medir(funcao, args.repeticoes):6.2f} µs/resposta")
+
+    print("\nExemplo (youtube):")
+    print(f"  antes : {limpar_texto_anterior(RESPOSTAS_GEMINI[3])}")
+    print(f"  depois: {formatar_resposta(RESPOSTAS_GEMINI[3], PERFIL_YOUTUBE, 'viewer_123')}")
+
+
+if __name__ == "__main__":
+    main()
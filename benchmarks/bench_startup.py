@@ -0,0 +1,103 @@
+"""
+Benchmark do cold start do app Flask.
+
+Cada rodada abre um interpretador novo (como um wake-up no plano gratuito do
+Render), importa o app e faz o primeiro GET / com o cliente de testes do
+Flask. Mede o tempo de import, o tempo até o primeiro 200 e verifica que as
+bibliotecas pesadas não foram carregadas. Sai com código 1 se o orçamento de
+tempo for estourado ou se alguma biblioteca pesada for importada no startup.
+
+Uso: python -m benchmarks.bench_startup [--rodadas 5] [--orcamento-ms 1500] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Bibliotecas que só devem ser carregadas quando um bot é iniciado
+MODULOS_PESADOS = [
+    "pandas", "gspread", "google.auth", "googleapiclient", "google.generativeai",
+    "twitchio", "aiohttp", "requests", "Bot_Twitch", "youtube_hello", "wow_comparative",
+]
+
+SCRIPT_FILHO = """
+import json, sys, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+resposta = app.app.test_client().get("/")
+primeiro_200 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (importado - inicio) * 1000,
+    "first_200_ms": (primeiro_200 - inicio) * 1000,
+    "status": resposta.status_code,
+    "pesados": [m for m in %r if m in sys.modules],
+}))
+""" % (MODULOS_PESADOS,)
+
+
+def raiz_do_projeto():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rodada():
+    """Executa um cold start em um processo novo e retorna as medições."""
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, "-c", SCRIPT_FILHO], cwd=raiz_do_projeto(),
+                           capture_output=True, text=True, check=True)
+    total_ms = (time.perf_counter() - inicio) * 1000
+    resultado = json.loads(saida.stdout.strip().splitlines()[-1])
+    resultado["process_ms"] = total_ms
+    return resultado
+
+
+def maiores_imports(quantidade=10):
+    """Usa python -X importtime para listar os módulos mais caros do import do app."""
+    saida = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=raiz_do_projeto(),
+                           capture_output=True, text=True)
+    custos = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        partes = [parte.strip() for parte in linha[len("import time:"):].split("|")]
+        if partes[1].isdigit():
+            custos.append((int(partes[1]), partes[2]))
+    return sorted(custos, reverse=True)[:quantidade]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do cold start do app Flask")
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--orcamento-ms", type=float, default=1500,
+                        help="Tempo máximo até o primeiro 200 (mediana)")
+    parser.add_argument("--importtime", action="store_true", help="Lista os imports mais caros")
+    args = parser.parse_args()
+
+    resultados = [rodada() for _ in range(args.rodadas)]
+    for campo, nome in (("import_ms", "import app"), ("first_200_ms", "até o primeiro 200"),
+                        ("process_ms", "processo completo")):
+        valores = [resultado[campo] for resultado in resultados]
+        print(f"{nome:20s}: mediana {statistics.median(valores):7.1f} ms | máx {max(valores):7.1f} ms")
+
+    pesados = sorted({modulo for resultado in resultados for modulo in resultado["pesados"]})
+    status = {resultado["status"] for resultado in resultados}
+    print(f"status de GET /     : {', '.join(map(str, sorted(status)))}")
+    print(f"módulos pesados     : {', '.join(pesados) if pesados else 'nenhum'}")
+
+    if args.importtime:
+        print("\nImports mais caros (cumulativo):")
+        for microssegundos, modulo in maiores_imports():
+            print(f"  {microssegundos / 1000:7.1f} ms  {modulo}")
+
+    mediana = statistics.median(resultado["first_200_ms"] for resultado in resultados)
+    if mediana > args.orcamento_ms or pesados or status != {200}:
+        print(f"\n❌ Fora do orçamento (limite {args.orcamento_ms:.0f} ms até o primeiro 200, sem módulos pesados)")
+        sys.exit(1)
+    print(f"\n✅ Dentro do orçamento ({mediana:.1f} ms ≤ {args.orcamento_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
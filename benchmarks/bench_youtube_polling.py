@@ -0,0 +1,78 @@
+"""
+Benchmark do polling enxuto do chat do YouTube.
+
+Compara o tamanho em bytes de uma página de liveChatMessages().list() completa
+com a mesma página restrita pelo parâmetro "fields" (CAMPOS_CHAT_YOUTUBE), e o
+tempo de decodificar o JSON e convertê-lo para ChatMessage.
+
+Uso: python -m benchmarks.bench_youtube_polling [--itens 75] [--repeticoes 2000]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.bench_chat_message import gerar_itens_youtube
+from chat_message import from_youtube
+
+# Mesma máscara usada por youtube_hello.CAMPOS_CHAT_YOUTUBE, em forma de árvore
+MASCARA_ENXUTA = {
+    "nextPageToken": True,
+    "pollingIntervalMillis": True,
+    "items": {
+        "id": True,
+        "snippet": {"displayMessage": True, "publishedAt": True},
+        "authorDetails": {"channelId": True, "displayName": True, "isChatOwner": True,
+                          "isChatModerator": True, "isChatSponsor": True},
+    },
+}
+
+
+def aplicar_mascara(valor, mascara):
+    """Reproduz localmente o efeito do parâmetro "fields" da API."""
+    if mascara is True:
+        return valor
+    if isinstance(valor, list):
+        return [aplicar_mascara(item, mascara) for item in valor]
+    return {chave: aplicar_mascara(valor[chave], sub) for chave, sub in mascara.items() if chave in valor}
+
+
+def gerar_pagina(quantidade):
+    """Gera uma página completa no formato part=snippet,authorDetails."""
+    return {
+        "kind": "youtube#liveChatMessageListResponse",
+        "etag": "xyz-etag",
+        "pollingIntervalMillis": 5000,
+        "pageInfo": {"totalResults": quantidade, "resultsPerPage": quantidade},
+        "nextPageToken": "GO_mOq-Qw4wDIIjV6J3Qw4wD",
+        "items": gerar_itens_youtube(quantidade),
+    }
+
+
+def medir_parse(corpo, repeticoes):
+    """Tempo médio (µs) para decodificar a página e converter os itens."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        pagina = json.loads(corpo)
+        [from_youtube(item) for item in pagina.get("items", [])]
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do polling enxuto do YouTube")
+    parser.add_argument("--itens", type=int, default=75, help="Mensagens por página")
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    pagina = gerar_pagina(args.itens)
+    corpo_completo = json.dumps(pagina, indent=2).encode()  # a API devolve JSON indentado
+    corpo_enxuto = json.dumps(aplicar_mascara(pagina, MASCARA_ENXUTA), indent=2).encode()
+
+    print(f"Página com {args.itens} mensagens:")
+    for nome, corpo in (("completo", corpo_completo), ("enxuto", corpo_enxuto)):
+        tempo = medir_parse(corpo, args.repeticoes)
+        print(f"  {nome:8s}: {len(corpo):8,d} bytes/poll  parse + conversão {tempo:8.1f} µs")
+    print(f"Redução: {100 * (1 - len(corpo_enxuto) / len(corpo_completo)):.1f}% dos bytes")
+
+
+if __name__ == "__main__":
+    main()
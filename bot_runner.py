@@ -0,0 +1,432 @@
+"""
+Processo único que executa os bots (Twitch, YouTube e keep-alive).
+
+O gunicorn pode subir vários workers HTTP; se cada worker iniciasse os bots,
+o chat receberia respostas duplicadas. Por isso os bots rodam em um único
+processo separado, iniciado uma vez pelo master do gunicorn (ver
+gunicorn.conf.py) e reiniciado por ele se cair, e os workers apenas repassam os comandos de controle
+(/start, /stop, /restart, /status...) para ele por IPC local
+(multiprocessing.connection, autenticado com uma chave compartilhada).
+
+Uso direto: python -m bot_runner
+"""
+import json
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from dotenv import load_dotenv
+
+import metrics
+import tracing
+from supervisor import Supervisor
+from utils import setup_logging, check_environment_variables, setup_credentials_files
+
+logger = logging.getLogger(__name__)
+
+TWITCH_REQUIRED_VARS = ["GEMINI_API_KEY", "TWITCH_CANAL", "TWITCH_CLIENT_ID", "TWITCH_REFRESH_TOKEN"]
+
+
+class RunnerUnavailable(Exception):
+    """O processo dos bots não está acessível (ainda iniciando ou encerrado)."""
+
+
+def runner_address():
+    return (os.getenv("BOT_RUNNER_HOST", "127.0.0.1"), int(os.getenv("BOT_RUNNER_PORT", "6001")))
+
+
+def runner_authkey():
+    chave = os.getenv("BOT_RUNNER_AUTHKEY")
+    if not chave:
+        raise RunnerUnavailable("BOT_RUNNER_AUTHKEY não está definida")
+    return chave.encode()
+
+
+def verificar_arquivos_credenciais():
+    """Verifica se os arquivos de credenciais necessários existem e são válidos."""
+    files_to_check = {
+        "TOKEN_FILE": os.getenv("TOKEN_FILE", "token.json"),
+        "CLIENT_SECRETS_FILE": os.getenv("CLIENT_SECRETS_FILE", "client_secret.json"),
+        "CREDENTIALS_FILE": os.getenv("CREDENTIALS_FILE", "credentials.json")
+    }
+
+    for name, path in files_to_check.items():
+        if os.path.exists(path):
+            file_size = os.path.getsize(path)
+            logger.info(f"✅ Arquivo {name} ({path}) existe com tamanho {file_size} bytes")
+
+            # Verificar se é um JSON válido
+            try:
+                with open(path, 'r') as f:
+                    json.loads(f.read())
+                logger.info(f"✅ Arquivo {name} contém JSON válido")
+            except Exception as e:
+                logger.error(f"❌ Arquivo {name} não contém JSON válido: {e}")
+        else:
+            logger.error(f"❌ Arquivo {name} ({path}) não existe")
+
+    # Verificar variáveis de ambiente críticas
+    env_vars = ["GEMINI_API_KEY", "TWITCH_CANAL", "TWITCH_CLIENT_ID",
+                "TWITCH_REFRESH_TOKEN", "YOUTUBE_VIDEO_ID"]
+
+    for var in env_vars:
+        value = os.getenv(var)
+        if value:
+            # Mostrar apenas os primeiros caracteres para segurança
+            display_value = value[:5] + "..." if len(value) > 5 else "[vazio]"
+            logger.info(f"✅ Variável {var} definida como {display_value}")
+        else:
+            logger.warning(f"⚠️ Variável {var} não definida")
+
+
+class BotRunner:
+    """Comandos de controle dos bots; o ciclo de vida das engines fica com o Supervisor."""
+
+    def __init__(self, supervisor=None):
+        # Uma engine por plataforma (thread ou processo, conforme BOT_ISOLATION)
+        self.supervisor = supervisor or Supervisor(
+            ("twitch", "youtube"),
+            stop_timeout=int(os.getenv("BOT_STOP_TIMEOUT", "20")),
+            backoff_max=int(os.getenv("BOT_RESTART_BACKOFF_MAX", "300")),
+        )
+        self.supervisor.start_monitor()
+        self.keep_alive_service = None
+        self.keep_alive_status = "stopped"
+
+    def _engine_status(self, service):
+        return self.supervisor.state(service).status
+
+    @property
+    def bot_status(self):
+        snapshot = self.supervisor.snapshot()
+        return {
+            "twitch": snapshot["twitch"].status,
+            "youtube": snapshot["youtube"].status,
+            "keep_alive": self.keep_alive_status
+        }
+
+    @staticmethod
+    def _services(service):
+        return ["twitch", "youtube"] if service == "all" else [service]
+
+    def _start_keep_alive(self):
+        from keep_alive import KeepAliveService
+
+        self.keep_alive_service = KeepAliveService(interval_minutes=10)
+        self.keep_alive_service.start()
+        self.keep_alive_status = "running"
+
+    def _stop_keep_alive(self):
+        if self.keep_alive_service and self.keep_alive_status == "running":
+            self.keep_alive_service.stop()
+            self.keep_alive_status = "stopped"
+
+    def start(self, service="all"):
+        """Inicia os bots solicitados que ainda não estão rodando."""
+        verificar_arquivos_credenciais()
+        start_result = {"message": "Iniciando bots solicitados", "details": {}}
+
+        # Iniciar bot da Twitch se não estiver rodando
+        if self._engine_status("twitch") not in ("running", "starting") and service in ["all", "twitch"]:
+            if missing_vars := check_environment_variables(TWITCH_REQUIRED_VARS):
+                start_result["details"]["twitch"] = f"Não iniciado - faltam variáveis: {', '.join(missing_vars)}"
+            else:
+                iniciou = self.supervisor.start("twitch")
+                start_result["details"]["twitch"] = (
+                    "Iniciando" if iniciou else f"Já em execução (status: {self._engine_status('twitch')})")
+        else:
+            start_result["details"]["twitch"] = f"Status atual: {self._engine_status('twitch')}"
+
+        # Iniciar bot do YouTube se não estiver rodando e YOUTUBE_VIDEO_ID estiver definido
+        if self._engine_status("youtube") not in ("running", "starting") and service in ["all", "youtube"]:
+            if not os.getenv("YOUTUBE_VIDEO_ID"):
+                start_result["details"]["youtube"] = "Não iniciado - YOUTUBE_VIDEO_ID não definido"
+            elif missing_vars := check_environment_variables(["GEMINI_API_KEY"]):
+                start_result["details"]["youtube"] = f"Não iniciado - faltam variáveis: {', '.join(missing_vars)}"
+            else:
+                iniciou = self.supervisor.start("youtube")
+                start_result["details"]["youtube"] = (
+                    "Iniciando" if iniciou else f"Já em execução (status: {self._engine_status('youtube')})")
+        else:
+            start_result["details"]["youtube"] = f"Status atual: {self._engine_status('youtube')}"
+
+        # Iniciar serviço de keep-alive para manter o aplicativo ativo
+        if self.keep_alive_status != "running":
+            self._start_keep_alive()
+            start_result["details"]["keep_alive"] = "Iniciado"
+        else:
+            start_result["details"]["keep_alive"] = f"Status atual: {self.keep_alive_status}"
+
+        return start_result
+
+    def stop(self, service="all"):
+        """Para os bots solicitados, esperando as filas esvaziarem (all também para o keep-alive)."""
+        if service not in ("all", "twitch", "youtube"):
+            return {"error": f"Serviço desconhecido: {service}"}
+        details = {}
+        for nome in self._services(service):
+            parou = self.supervisor.stop(nome)
+            details[nome] = "Parado" if parou else "Não parou dentro do tempo"
+        if service == "all":
+            self._stop_keep_alive()
+        return {"message": "Bots parados", "details": details, "status": self.bot_status}
+
+    def status(self):
+        snapshot = self.supervisor.snapshot()
+        result = {"bots": self.bot_status, "supervisor": {}}
+        for service, estado in snapshot.items():
+            result["supervisor"][service] = {
+                "desired": estado.desired,
+                "restarts": estado.restarts,
+                "failures": estado.failures,
+                "last_error": estado.last_error,
+                "next_restart_at": estado.next_restart_at,
+            }
+            # Detalhes de cada engine, ex: fila do !compare e refresher do bot da Twitch
+            result.update(estado.details)
+        return result
+
+    def update_youtube(self, video_id):
+        """Troca o vídeo monitorado e (re)inicia o bot do YouTube."""
+        os.environ['YOUTUBE_VIDEO_ID'] = video_id
+        logger.info(f"🔄 ID do vídeo do YouTube atualizado para: {video_id}")
+
+        # Uma engine parada (ou viva com erro) é iniciada de novo; uma que está rodando
+        # ainda usa o vídeo antigo e precisa ser reiniciada para ler o novo ID
+        if self.supervisor.start("youtube"):
+            message = f"ID do vídeo atualizado para {video_id} e bot do YouTube está sendo iniciado"
+        else:
+            self.supervisor.restart("youtube")
+            message = f"ID do vídeo atualizado para {video_id} e bot do YouTube está sendo reiniciado"
+        return {"message": message, "status": self.bot_status}
+
+    def restart(self, bot="all"):
+        """Reinicia um bot específico (all, twitch, youtube)."""
+        result = {"message": f"Solicitação de reinício recebida para: {bot}", "status": {}}
+
+        if bot in ("all", "twitch"):
+            self.supervisor.restart("twitch")
+            result["status"]["twitch"] = "reiniciando"
+
+        if bot in ("all", "youtube"):
+            if os.getenv("YOUTUBE_VIDEO_ID"):
+                self.supervisor.restart("youtube")
+                result["status"]["youtube"] = "reiniciando"
+            else:
+                result["status"]["youtube"] = "desativado (YOUTUBE_VIDEO_ID não definido)"
+
+        return result
+
+    def autostart(self):
+        """Inicia automaticamente os bots cujas variáveis de ambiente estão definidas."""
+        if not check_environment_variables(TWITCH_REQUIRED_VARS):
+            logger.info("Iniciando Bot da Twitch automaticamente...")
+            self.supervisor.start("twitch")
+        else:
+            logger.warning("⚠️ Bot da Twitch não iniciado automaticamente - variáveis de ambiente ausentes")
+
+        if os.getenv("YOUTUBE_VIDEO_ID") and not check_environment_variables(["GEMINI_API_KEY"]):
+            logger.info("Iniciando Bot do YouTube automaticamente...")
+            self.supervisor.start("youtube")
+        else:
+            logger.warning("⚠️ Bot do YouTube não iniciado automaticamente - YOUTUBE_VIDEO_ID ou GEMINI_API_KEY ausente")
+
+        logger.info("Iniciando serviço keep-alive...")
+        self._start_keep_alive()
+
+    def shutdown(self):
+        """Para todas as engines em paralelo (saída do processo dos bots)."""
+        logger.info("🛑 Encerrando os bots...")
+        self._stop_keep_alive()
+        self.supervisor.shutdown()
+
+    def metrics(self):
+        """Métricas do processo dos bots somadas às das engines em processos próprios."""
+        return metrics.merge(metrics.snapshot(), *self.supervisor.collect("metrics"))
+
+    def traces(self, limit=20, name=None):
+        """Os traces mais lentos entre os recentes do processo dos bots e das engines."""
+        todos = tracing.recent_traces()
+        for traces in self.supervisor.collect("traces"):
+            todos.extend(traces)
+        return {"total": len(todos), "traces": tracing.slowest(todos, limit, name)}
+
+    def handle(self, request):
+        """Executa um comando recebido por IPC: {"cmd": nome, ...argumentos}."""
+        comandos = {
+            "start": self.start,
+            "stop": self.stop,
+            "status": self.status,
+            "update_youtube": self.update_youtube,
+            "restart": self.restart,
+            "metrics": self.metrics,
+            "traces": self.traces,
+        }
+        argumentos = dict(request)
+        comando = comandos.get(argumentos.pop("cmd", None))
+        if comando is None:
+            return {"error": f"Comando desconhecido: {request.get('cmd')}"}
+        return comando(**argumentos)
+
+
+def _atender(runner, conn):
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                return
+            try:
+                response = runner.handle(request)
+            except Exception as e:
+                logger.error(f"❌ Erro ao executar comando {request!r}: {e}")
+                response = {"error": str(e)}
+            conn.send(response)
+    finally:
+        conn.close()
+
+
+def serve(runner):
+    """Aceita conexões dos workers HTTP e executa seus comandos."""
+    with Listener(runner_address(), authkey=runner_authkey()) as listener:
+        logger.info(f"🤖 Processo dos bots aguardando comandos em {listener.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Conexão com chave errada ou interrompida no handshake
+                logger.warning(f"⚠️ Conexão de controle recusada: {e}")
+                continue
+            threading.Thread(target=_atender, args=(runner, conn), daemon=True).start()
+
+
+def call(cmd, timeout=10, **kwargs):
+    """
+    Envia um comando ao processo dos bots e retorna a resposta (dict).
+
+    Raises:
+        RunnerUnavailable: Se o processo não estiver acessível ou não responder a tempo
+    """
+    try:
+        conn = Client(runner_address(), authkey=runner_authkey())
+    except (OSError, AuthenticationError) as e:
+        raise RunnerUnavailable(f"Processo dos bots indisponível: {e}")
+    try:
+        conn.send({"cmd": cmd, **kwargs})
+        if not conn.poll(timeout):
+            raise RunnerUnavailable(f"Processo dos bots não respondeu em {timeout}s")
+        return conn.recv()
+    except (EOFError, OSError) as e:
+        raise RunnerUnavailable(f"Conexão com o processo dos bots perdida: {e}")
+    finally:
+        conn.close()
+
+
+_runner_process = None
+_runner_started_at = 0.0
+_runner_lock = threading.Lock()
+_watchdog = None
+_watchdog_stop = threading.Event()
+
+# Vigia do processo dos bots (no master do gunicorn): se ele cair, é reiniciado com
+# backoff exponencial, que volta ao início depois de WATCHDOG_STABLE_AFTER sem quedas
+WATCHDOG_INTERVAL = 5
+WATCHDOG_BACKOFF_BASE = 5
+WATCHDOG_BACKOFF_MAX = 300
+WATCHDOG_STABLE_AFTER = 600
+
+
+def spawn():
+    """
+    Inicia o processo dos bots (uma única vez, a partir do master do gunicorn
+    ou do __main__ do app) e a thread que o reinicia se ele cair. A chave do
+    IPC é criada aqui, se não estiver definida, e herdada pelos workers HTTP e
+    pelo processo dos bots.
+    """
+    global _watchdog
+    with _runner_lock:
+        processo = _spawn_locked()
+        if _watchdog is None:
+            _watchdog_stop.clear()
+            _watchdog = threading.Thread(target=_watch, name="bot-runner-watchdog", daemon=True)
+            _watchdog.start()
+    return processo
+
+
+def _spawn_locked():
+    global _runner_process, _runner_started_at
+    if _runner_process is not None and _runner_process.poll() is None:
+        return _runner_process
+    os.environ.setdefault("BOT_RUNNER_AUTHKEY", secrets.token_hex(16))
+    _runner_process = subprocess.Popen([sys.executable, "-m", "bot_runner"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)))
+    _runner_started_at = time.monotonic()
+    logger.info(f"🚀 Processo dos bots iniciado (pid {_runner_process.pid})")
+    return _runner_process
+
+
+def _watch():
+    """Reinicia o processo dos bots quando ele termina sem que terminate() tenha sido chamado."""
+    falhas = 0
+    while not _watchdog_stop.wait(WATCHDOG_INTERVAL):
+        with _runner_lock:
+            processo = _runner_process
+            vivo = processo is None or processo.poll() is None
+            if vivo and falhas and time.monotonic() - _runner_started_at >= WATCHDOG_STABLE_AFTER:
+                falhas = 0
+        if vivo:
+            continue
+        falhas += 1
+        espera = min(WATCHDOG_BACKOFF_MAX, WATCHDOG_BACKOFF_BASE * 2 ** (falhas - 1))
+        logger.warning(f"⚠️ Processo dos bots terminou (código {processo.returncode}); reiniciando em {espera:.0f}s")
+        if _watchdog_stop.wait(espera):
+            return
+        with _runner_lock:
+            # terminate() ou spawn() podem ter agido enquanto esperávamos
+            if _runner_process is processo and not _watchdog_stop.is_set():
+                _spawn_locked()
+
+
+def terminate(timeout=45):
+    """Encerra o processo dos bots iniciado por spawn(), esperando a parada graciosa das engines."""
+    global _runner_process, _watchdog
+    # Para a vigia antes, para que ela não reinicie o processo que está sendo encerrado
+    _watchdog_stop.set()
+    _watchdog = None
+    with _runner_lock:
+        if _runner_process is None:
+            return
+        _runner_process.terminate()
+        try:
+            _runner_process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            _runner_process.kill()
+        _runner_process = None
+
+
+def main():
+    setup_logging()
+    load_dotenv()
+    setup_credentials_files()
+    runner = BotRunner()
+
+    def encerrar(signum, frame):
+        runner.shutdown()
+        sys.exit(0)
+
+    # SIGTERM vem do gunicorn (on_exit) ou do Render: as filas são esvaziadas antes de sair
+    signal.signal(signal.SIGTERM, encerrar)
+    if os.getenv("BOT_AUTOSTART", "true").lower() != "false":
+        runner.autostart()
+    serve(runner)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Modelo normalizado de mensagens de chat, compartilhado pela Twitch e pelo YouTube.
+
+Cada plataforma converte suas mensagens uma única vez na entrada (objetos do
+twitchio ou itens do liveChatMessages do YouTube) para um ChatMessage compacto,
+e todo o processamento posterior (filtros, cooldowns, comandos) é escrito uma
+única vez sobre esse formato através do ChatPipeline.
+"""
+import inspect
+import time
+from collections import deque
+from datetime import datetime
+
+import metrics
+import tracing
+
+PLATAFORMA_TWITCH = "twitch"
+PLATAFORMA_YOUTUBE = "youtube"
+
+_mensagens = metrics.counter("chat_messages_total", "Mensagens de chat recebidas (sem duplicadas)", ("platform",))
+_comandos = metrics.counter("chat_commands_total", "Comandos de chat despachados para um handler",
+                            ("platform", "command"))
+_duracao_comandos = metrics.histogram("chat_command_seconds", "Tempo de execução dos handlers de comando",
+                                      ("platform", "command"))
+_erros_comandos = metrics.counter("chat_command_errors_total", "Exceções nos handlers de comando, por tipo",
+                                  ("platform", "command", "error"))
+
+
+class Author:
+    """Autor de uma mensagem de chat, independente da plataforma."""
+
+    __slots__ = ("id", "name", "display_name", "is_owner", "is_moderator", "is_subscriber")
+
+    def __init__(self, id, name, display_name=None, is_owner=False, is_moderator=False, is_subscriber=False):
+        self.id = id
+        self.name = name
+        self.display_name = display_name or name
+        self.is_owner = is_owner
+        self.is_moderator = is_moderator
+        self.is_subscriber = is_subscriber
+
+    def __repr__(self):
+        return f"Author({self.name!r})"
+
+
+class ChatMessage:
+    """
+    Mensagem de chat normalizada.
+
+    Atributos:
+        id: ID da mensagem na plataforma de origem
+        platform: "twitch" ou "youtube"
+        author: Author da mensagem
+        content: Texto da mensagem
+        timestamp: Momento da mensagem (epoch em segundos)
+        raw: Objeto original da plataforma (necessário para responder pela Twitch)
+    """
+
+    __slots__ = ("id", "platform", "author", "content", "timestamp", "raw")
+
+    def __init__(self, id, platform, author, content, timestamp=None, raw=None):
+        self.id = id
+        self.platform = platform
+        self.author = author
+        self.content = content
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.raw = raw
+
+    def parse_command(self, prefix="!"):
+        """Retorna (comando, argumentos) se a mensagem for um comando, ou (None, None)."""
+        content = self.content
+        if not content.startswith(prefix):
+            return None, None
+        nome, _, argumentos = content[len(prefix):].partition(" ")
+        return nome.lower(), argumentos.strip()
+
+    def __repr__(self):
+        return f"ChatMessage({self.platform}, {self.author.name!r}, {self.content[:30]!r})"
+
+
+def _timestamp_iso(valor):
+    """Converte um timestamp ISO 8601 (formato do YouTube) para epoch em segundos."""
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def from_twitch(message):
+    """Converte uma mensagem do twitchio para ChatMessage."""
+    autor = message.author
+    if autor is not None:
+        author = Author(
+            id=getattr(autor, "id", None),
+            name=autor.name,
+            display_name=getattr(autor, "display_name", None),
+            is_owner=bool(getattr(autor, "is_broadcaster", False)),
+            is_moderator=bool(getattr(autor, "is_mod", False)),
+            is_subscriber=bool(getattr(autor, "is_subscriber", False)),
+        )
+    else:
+        # Mensagens "echo" (enviadas pelo próprio bot) não têm autor
+        author = Author(id=None, name="")
+
+    timestamp = getattr(message, "timestamp", None)
+    return ChatMessage(
+        id=getattr(message, "id", None),
+        platform=PLATAFORMA_TWITCH,
+        author=author,
+        content=message.content or "",
+        timestamp=timestamp.timestamp() if timestamp else None,
+        raw=message,
+    )
+
+
+def from_youtube(item):
+    """Converte um item de liveChatMessages().list() para ChatMessage."""
+    detalhes = item.get("authorDetails", {})
+    snippet = item.get("snippet", {})
+    author = Author(
+        id=detalhes.get("channelId"),
+        name=detalhes.get("displayName", ""),
+        is_owner=detalhes.get("isChatOwner", False),
+        is_moderator=detalhes.get("isChatModerator", False),
+        is_subscriber=detalhes.get("isChatSponsor", False),
+    )
+    return ChatMessage(
+        id=item.get("id"),
+        platform=PLATAFORMA_YOUTUBE,
+        author=author,
+        content=snippet.get("displayMessage") or "",
+        timestamp=_timestamp_iso(snippet.get("publishedAt")),
+    )
+
+
+class Cooldown:
+    """
+    Controle de cooldown por usuário, usado pelos comandos das duas plataformas.
+
+    `ultimos_usos` é o mapeamento usuário -> instante do último uso; passe um
+    state_store.StateMap para que os cooldowns sobrevivam a um reinício.
+    """
+
+    def __init__(self, segundos=60, ultimos_usos=None):
+        self.segundos = segundos
+        self.ultimos_usos = ultimos_usos if ultimos_usos is not None else {}
+
+    def restante(self, usuario, agora=None):
+        """Retorna quantos segundos faltam para o usuário poder usar o comando novamente."""
+        ultimo = self.ultimos_usos.get(usuario)
+        if ultimo is None:
+            return 0
+        agora = agora if agora is not None else time.time()
+        return max(0, ultimo + self.segundos - agora)
+
+    def registrar(self, usuario, agora=None):
+        """Registra o uso do comando pelo usuário."""
+        self.ultimos_usos[usuario] = agora if agora is not None else time.time()
+
+
+class ChatPipeline:
+    """
+    Pipeline único de processamento de mensagens.
+
+    Etapas: descarte de duplicadas -> filtros -> identificação do comando ->
+    handler registrado. Handlers podem ser funções comuns (YouTube) ou
+    corrotinas (Twitch); no segundo caso, process() retorna o awaitable.
+
+    `ids_processados` (ID -> instante do processamento) pode ser um
+    state_store.StateMap, para não responder de novo mensagens já processadas
+    depois de um reinício.
+    """
+
+    def __init__(self, prefix="!", max_ids=10000, ids_processados=None):
+        self.prefix = prefix
+        self.handlers = {}
+        self.default_handler = None
+        self.filters = []
+        # Janela limitada de IDs já processados, para não crescer indefinidamente
+        self.max_ids = max_ids
+        self._ids_processados = ids_processados if ids_processados is not None else {}
+        self._ordem_ids = deque(sorted(self._ids_processados, key=self._ids_processados.get))
+        while len(self._ordem_ids) > self.max_ids:
+            self._ids_processados.pop(self._ordem_ids.popleft(), None)
+
+    def command(self, nome):
+        """Decorator para registrar um handler de comando."""
+        def decorator(handler):
+            self.handlers[nome.lower()] = handler
+            return handler
+        return decorator
+
+    def add_filter(self, filtro):
+        """Adiciona um filtro; mensagens para as quais o filtro retorna False são descartadas."""
+        self.filters.append(filtro)
+
+    def ja_processada(self, msg_id):
+        """Marca o ID como processado e informa se ele já havia sido visto."""
+        if msg_id is None:
+            return False
+        if msg_id in self._ids_processados:
+            return True
+        self._ids_processados[msg_id] = time.time()
+        self._ordem_ids.append(msg_id)
+        if len(self._ordem_ids) > self.max_ids:
+            self._ids_processados.pop(self._ordem_ids.popleft(), None)
+        return False
+
+    def process(self, message):
+        """
+        Processa uma ChatMessage e retorna o resultado do handler (ou None).
+        """
+        if self.ja_processada(message.id):
+            return None
+        _mensagens.labels(message.platform).inc()
+        for filtro in self.filters:
+            if not filtro(message):
+                return None
+
+        comando, argumentos = message.parse_command(self.prefix)
+        if comando is None:
+            return None
+
+        handler = self.handlers.get(comando, self.default_handler)
+        if handler is None:
+            return None
+        _comandos.labels(message.platform, comando).inc()
+        # Um trace por comando, do recebimento da mensagem até a resposta
+        raiz = tracing.start_trace(f"{message.platform}.{comando}", message_id=message.id,
+                                   author=message.author.name,
+                                   lag_ms=round(max(0.0, time.time() - message.timestamp) * 1000, 1))
+        token = tracing.activate(raiz)
+        inicio = time.perf_counter()
+        try:
+            resultado = handler(message, argumentos)
+        except Exception as e:
+            _erros_comandos.labels(message.platform, comando, type(e).__name__).inc()
+            raiz.finish(e)
+            raise
+        finally:
+            tracing.deactivate(token)
+        if inspect.isawaitable(resultado):
+            return self._medir(resultado, message.platform, comando, inicio, raiz)
+        _duracao_comandos.labels(message.platform, comando).observe(time.perf_counter() - inicio)
+        raiz.finish()
+        return resultado
+
+    @staticmethod
+    async def _medir(resultado, plataforma, comando, inicio, raiz):
+        """Aguarda o handler assíncrono (com o trace do comando ativo) registrando a duração e eventuais erros."""
+        token = tracing.activate(raiz)
+        erro = None
+        try:
+            return await resultado
+        except Exception as e:
+            erro = e
+            _erros_comandos.labels(plataforma, comando, type(e).__name__).inc()
+            raise
+        finally:
+            tracing.deactivate(token)
+            raiz.finish(erro)
+            _duracao_comandos.labels(plataforma, comando).observe(time.perf_counter() - inicio)
+
+    async def process_async(self, message):
+        """Versão assíncrona de process(), aguardando handlers que sejam corrotinas."""
+        resultado = self.process(message)
+        if inspect.isawaitable(resultado):
+            resultado = await resultado
+        return resultado
@@ -0,0 +1,327 @@
+"""
+Engines dos bots: a execução de cada plataforma (Twitch, YouTube) isolada em
+uma thread ou em um processo próprio.
+
+No modo processo (BOT_ISOLATION=process, o padrão) cada engine tem seu próprio
+interpretador e GIL: o loop bloqueante do YouTube, as chamadas síncronas ao
+Gemini e o processamento do !compare deixam de competir com o event loop da
+Twitch, e a queda de uma plataforma não derruba a outra. O processo dos bots
+conversa com cada engine por um Pipe (status e detalhes). O modo thread
+mantém tudo no mesmo processo e usa menos memória: cada engine em processo
+reimporta as bibliotecas pesadas, por isso o render.yaml usa thread no plano
+free (512 MB).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+ISOLATION_MODES = ("process", "thread")
+
+
+class EngineContext:
+    """Estado compartilhado entre o código da engine e quem a supervisiona."""
+
+    def __init__(self):
+        self.status = "starting"
+        # Substituído pela engine por uma função que retorna métricas extras (dict)
+        self.details = dict
+        self.stop_event = threading.Event()
+        # Definido pela engine quando ela precisa de mais que o stop_event para parar
+        self.on_stop = None
+
+    def stop(self):
+        """Pede a parada graciosa da engine (pode ser chamado de outra thread)."""
+        self.stop_event.set()
+        if self.on_stop is not None:
+            self.on_stop()
+
+
+def run_twitch(context):
+    """Executa o bot da Twitch até a conexão ser encerrada ou a parada ser pedida."""
+    loop = None
+    try:
+        logger.info("🎮 Iniciando bot da Twitch...")
+        # Importado só ao iniciar o bot: twitchio, Gemini, aiohttp etc.
+        from Bot_Twitch import MeuBot
+
+        # Criar um novo event loop para esta thread
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        bot = MeuBot()
+        context.details = lambda: {"compare_queue": bot.compare_queue.stats(), "refresher": dict(bot.refresher.stats)}
+
+        def parar():
+            # close() esvazia a fila do !compare antes de desconectar; depois o loop é parado
+            # (agendado mesmo que o loop ainda não tenha começado a rodar)
+            try:
+                futuro = asyncio.run_coroutine_threadsafe(bot.close(), loop)
+                futuro.add_done_callback(lambda _: loop.call_soon_threadsafe(loop.stop))
+            except RuntimeError:
+                pass  # o loop já foi fechado: o bot já parou
+
+        context.on_stop = parar
+        if context.stop_event.is_set():
+            context.status = "stopped"
+            return
+        context.status = "running"
+        bot.run()
+        context.status = "stopped"
+    except Exception as e:
+        logger.error(f"❌ Erro ao iniciar bot da Twitch: {e}")
+        context.status = f"error: {str(e)}"
+    finally:
+        # Cada início cria um loop novo; o anterior é fechado para não vazar conexões
+        if loop is not None:
+            loop.close()
+
+
+def run_youtube(context):
+    """Executa o monitoramento do chat do YouTube."""
+    # Verificar se YOUTUBE_VIDEO_ID está definido - se não estiver, não iniciar
+    if not os.getenv("YOUTUBE_VIDEO_ID"):
+        logger.error("❌ YOUTUBE_VIDEO_ID não está definido - o serviço do YouTube não será iniciado")
+        context.status = "disabled"
+        return
+
+    try:
+        logger.info("🎥 Iniciando monitoramento do YouTube...")
+        # Importado só ao iniciar o monitor (googleapiclient e Gemini são pesados)
+        from youtube_hello import monitorar_chat_youtube
+
+        context.status = "running"
+        monitorar_chat_youtube(context.stop_event)
+        context.status = "stopped"
+    except Exception as e:
+        logger.error(f"❌ Erro ao iniciar monitoramento do YouTube: {e}")
+        context.status = f"error: {str(e)}"
+
+
+ENGINE_TARGETS = {"twitch": run_twitch, "youtube": run_youtube}
+
+
+class ThreadEngine:
+    """Engine executada em uma thread daemon do processo dos bots."""
+
+    def __init__(self, name):
+        self.name = name
+        self.context = EngineContext()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=ENGINE_TARGETS[self.name], args=(self.context,),
+                                        name=f"engine-{self.name}", daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        return self.context.status
+
+    def details(self):
+        try:
+            return self.context.details()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def stop(self, timeout=30):
+        """Parada graciosa; retorna False se a thread não terminar dentro do tempo."""
+        self.context.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.is_alive()
+
+    def terminate(self, timeout=5):
+        # Threads não podem ser interrompidas de fora; só processos
+        return False
+
+    def metrics(self):
+        # Mesmo processo: as métricas já estão no registro do processo dos bots
+        return None
+
+    def traces(self):
+        # Idem para o buffer de traces
+        return None
+
+
+def _process_main(name, conn):
+    """Ponto de entrada do processo de uma engine."""
+    from utils import setup_logging
+
+    setup_logging()
+    context = EngineContext()
+    # A thread de IPC e a saída da engine respondem pelo mesmo Pipe
+    envio = threading.Lock()
+
+    def responder(mensagem):
+        with envio:
+            conn.send(mensagem)
+
+    def atender():
+        while True:
+            try:
+                pedido = conn.recv()
+            except (EOFError, OSError):
+                # O processo dos bots terminou: a engine não deve ficar órfã
+                os._exit(0)
+            if pedido == "status":
+                try:
+                    detalhes = context.details()
+                except Exception as e:
+                    detalhes = {"error": str(e)}
+                responder({"status": context.status, "details": detalhes})
+            elif pedido == "metrics":
+                responder({"metrics": metrics.snapshot()})
+            elif pedido == "traces":
+                responder({"traces": tracing.recent_traces()})
+            elif pedido == "stop":
+                context.stop()
+
+    threading.Thread(target=atender, name="engine-ipc", daemon=True).start()
+    ENGINE_TARGETS[name](context)
+    if context.stop_event.is_set():
+        os._exit(0)
+    # A engine terminou sozinha (erro, chat ao vivo indisponível, conexão encerrada): o processo
+    # sai para o supervisor ver uma engine parada e aplicar o backoff de reinício, como no modo
+    # thread. O último status é enviado antes, para não virar só um código de saída.
+    try:
+        responder({"status": context.status, "details": {}})
+    except (EOFError, OSError):
+        pass
+    os._exit(1 if context.status.startswith("error") else 0)
+
+
+class ProcessEngine:
+    """Engine executada em um processo próprio, com um Pipe para status."""
+
+    def __init__(self, name, timeout=2):
+        self.name = name
+        self.timeout = timeout
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last = {"status": "starting", "details": {}}
+
+    def start(self):
+        # "spawn": o processo dos bots tem threads, e um fork poderia herdar locks travados
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_process_main, args=(self.name, child_conn),
+                                    name=f"engine-{self.name}", daemon=True)
+        self._process.start()
+        child_conn.close()
+        logger.info(f"🧩 Engine {self.name} iniciada no processo {self._process.pid}")
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _request(self, pedido, chave):
+        """Envia um pedido pelo Pipe e retorna a resposta que contém `chave` (ou None)."""
+        # Descarta respostas atrasadas de consultas anteriores que estouraram o tempo
+        while self._conn.poll(0):
+            self._conn.recv()
+        self._conn.send(pedido)
+        limite = time.monotonic() + self.timeout
+        while self._conn.poll(max(0.0, limite - time.monotonic())):
+            resposta = self._conn.recv()
+            if chave in resposta:
+                return resposta
+        return None
+
+    def _query(self):
+        with self._lock:
+            if self.is_alive():
+                try:
+                    resposta = self._request("status", "status")
+                    if resposta is not None:
+                        self._last = resposta
+                except (EOFError, OSError):
+                    pass
+            elif self._process is not None and self._process.exitcode is not None:
+                codigo = self._process.exitcode
+                status = "stopped" if codigo == 0 else f"error: processo terminou com código {codigo}"
+                self._last = {"status": status, "details": {}}
+                try:
+                    # A última mensagem do processo traz o erro original
+                    while self._conn.poll(0):
+                        self._last = self._conn.recv()
+                except (EOFError, OSError):
+                    pass
+            return self._last
+
+    def status(self):
+        return self._query()["status"]
+
+    def details(self):
+        return self._query()["details"]
+
+    def stop(self, timeout=30):
+        """
+        Parada graciosa: pede à engine que esvazie suas filas e saia; se o
+        processo não terminar dentro do tempo, ele é encerrado à força.
+
+        Returns:
+            True se a engine parou sozinha dentro do tempo
+        """
+        if not self.is_alive():
+            return True
+        with self._lock:
+            try:
+                self._conn.send("stop")
+            except (EOFError, OSError):
+                pass
+        self._process.join(timeout)
+        graciosa = not self._process.is_alive()
+        if not graciosa:
+            logger.warning(f"⚠️ Engine {self.name} não parou em {timeout}s; encerrando o processo")
+        self.terminate()
+        return graciosa
+
+    def _collect(self, pedido):
+        with self._lock:
+            if not self.is_alive():
+                return None
+            try:
+                resposta = self._request(pedido, pedido)
+            except (EOFError, OSError):
+                return None
+            return resposta[pedido] if resposta else None
+
+    def metrics(self):
+        """Snapshot das métricas do processo da engine (None se ele não responder)."""
+        return self._collect("metrics")
+
+    def traces(self):
+        """Traces recentes do processo da engine (None se ele não responder)."""
+        return self._collect("traces")
+
+    def terminate(self, timeout=5):
+        """Encerra o processo da engine."""
+        if self._process is None:
+            return True
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join(timeout)
+        self._conn.close()
+        return True
+
+
+def create_engine(name, mode=None):
+    """Cria a engine da plataforma no modo de isolamento configurado (BOT_ISOLATION)."""
+    mode = (mode or os.getenv("BOT_ISOLATION", "process")).lower()
+    if mode not in ISOLATION_MODES:
+        logger.warning(f"⚠️ BOT_ISOLATION inválido ({mode}); usando 'process'")
+        mode = "process"
+    return ProcessEngine(name) if mode == "process" else ThreadEngine(name)
@@ -0,0 +1,22 @@
+"""
+Configuração do gunicorn.
+
+O master inicia o processo único dos bots antes de criar os workers HTTP
+(e o reinicia se ele cair, ver bot_runner.spawn); assim o número de workers (WEB_CONCURRENCY) pode crescer sem duplicar os bots.
+A porta vem da variável PORT, que o gunicorn já usa por padrão.
+"""
+import os
+
+import bot_runner
+
+# /stop e /restart esperam a parada graciosa dos bots (até BOT_STOP_TIMEOUT por engine)
+timeout = int(os.getenv("BOT_STOP_TIMEOUT", "20")) * 2 + 20
+
+
+def on_starting(server):
+    processo = bot_runner.spawn()
+    server.log.info(f"Processo dos bots iniciado (pid {processo.pid})")
+
+
+def on_exit(server):
+    bot_runner.terminate()
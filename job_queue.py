@@ -0,0 +1,191 @@
+"""
+Fila assíncrona de jobs com um pool de workers, usada pelo !compare.
+
+O handler do chat apenas enfileira o job e responde na hora; os workers
+processam os jobs em segundo plano. Jobs com a mesma chave (ex: o mesmo
+personagem pedido por vários viewers) são processados uma única vez e todos
+os interessados recebem o mesmo resultado.
+"""
+import asyncio
+import time
+from collections import deque
+
+import metrics
+import tracing
+
+_profundidade = metrics.gauge("job_queue_depth", "Jobs aguardando na fila", ("queue",))
+_em_andamento = metrics.gauge("job_queue_in_progress", "Jobs sendo processados pelos workers", ("queue",))
+_jobs = metrics.counter("job_queue_jobs_total", "Jobs por resultado (completed, failed, deduplicated)",
+                        ("queue", "result"))
+_latencia = metrics.histogram("job_queue_latency_seconds", "Tempo do enfileiramento ao fim do job", ("queue",))
+
+
+class Job:
+    """Um job na fila; `future` recebe o resultado (ou a exceção) do worker."""
+
+    __slots__ = ("key", "args", "future", "seq", "created_at", "started_at", "finished_at", "waiters", "span")
+
+    def __init__(self, key, args, future, seq, span=None):
+        self.key = key
+        self.seq = seq
+        self.args = args
+        self.future = future
+        self.created_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.waiters = 1
+        # Span do trace de quem enfileirou; o worker o ativa para o job aparecer no mesmo trace
+        self.span = span
+
+    @property
+    def latency(self):
+        """Tempo total desde o enfileiramento até o fim do processamento."""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.created_at
+
+
+class JobQueue:
+    """
+    Fila com de-duplicação por chave e métricas de profundidade e latência.
+
+    Args:
+        handler: Corrotina chamada pelos workers com os argumentos do job
+        workers: Número de workers concorrentes
+        name: Nome usado nos logs
+    """
+
+    def __init__(self, handler, workers=3, name="jobs", latency_window=200):
+        self.handler = handler
+        self.workers = workers
+        self.name = name
+        self._queue = None
+        self._jobs = {}  # chave -> Job ainda não concluído
+        self._tasks = []
+        self._latencies = deque(maxlen=latency_window)
+        self._submissions = deque(maxlen=1000)  # instantes dos últimos pedidos
+        self._enqueued = 0
+        self._dequeued = 0
+        self.completed = 0
+        self.failed = 0
+        self.deduplicated = 0
+        _profundidade.set_function(lambda: self._queue.qsize() if self._queue else 0, name)
+        _em_andamento.set_function(
+            lambda: sum(1 for job in list(self._jobs.values()) if job.started_at is not None), name)
+
+    def start(self):
+        """Cria os workers no event loop atual."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"🧵 Fila '{self.name}' iniciada com {self.workers} workers")
+
+    async def submit(self, key, *args):
+        """
+        Enfileira um job, ou reaproveita o job pendente com a mesma chave.
+
+        Returns:
+            Tuple (job, posição na fila, True se o job é novo)
+        """
+        if not self._tasks:
+            self.start()
+        self._submissions.append(time.monotonic())
+        job = self._jobs.get(key)
+        if job is not None:
+            job.waiters += 1
+            self.deduplicated += 1
+            span = tracing.current_span()
+            if span is not None:
+                span.set(deduplicated=True)
+            _jobs.labels(self.name, "deduplicated").inc()
+            return job, self._position(job), False
+
+        self._enqueued += 1
+        job = Job(key, args, asyncio.get_running_loop().create_future(), self._enqueued,
+                  tracing.start_span(f"job_queue.{self.name}", key=str(key)))
+        self._jobs[key] = job
+        await self._queue.put(job)
+        return job, self._position(job), True
+
+    def _position(self, job):
+        if job.started_at is not None:
+            return 0
+        # A fila é FIFO: a posição é a distância até o último job retirado pelos workers
+        return job.seq - self._dequeued
+
+    async def _worker(self, numero):
+        while True:
+            job = await self._queue.get()
+            self._dequeued = job.seq
+            job.started_at = time.monotonic()
+            token = None
+            if job.span is not None:
+                job.span.set(wait_ms=round((job.started_at - job.created_at) * 1000, 1))
+                token = tracing.activate(job.span)
+            try:
+                resultado = await self.handler(*job.args)
+                if not job.future.done():
+                    job.future.set_result(resultado)
+                self.completed += 1
+                _jobs.labels(self.name, "completed").inc()
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                _jobs.labels(self.name, "failed").inc()
+                if job.span is not None:
+                    job.span.finish(e)
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                if token is not None:
+                    tracing.deactivate(token)
+                    job.span.finish()
+                job.finished_at = time.monotonic()
+                self._latencies.append(job.latency)
+                _latencia.labels(self.name).observe(job.latency)
+                self._jobs.pop(job.key, None)
+                self._queue.task_done()
+
+    def recent_submissions(self, seconds=60):
+        """Quantidade de pedidos (inclusive duplicados) nos últimos `seconds` segundos."""
+        limite = time.monotonic() - seconds
+        total = 0
+        for instante in reversed(self._submissions):
+            if instante < limite:
+                break
+            total += 1
+        return total
+
+    def is_busy(self, threshold=5, seconds=60):
+        """True se há jobs na fila ou se chegaram `threshold` pedidos nos últimos `seconds` segundos."""
+        pendentes = self._queue.qsize() if self._queue else 0
+        return pendentes > 0 or self.recent_submissions(seconds) >= threshold
+
+    def stats(self):
+        """Profundidade da fila e latência dos jobs recentes (em segundos)."""
+        latencias = sorted(self._latencies)
+        return {
+            "depth": self._queue.qsize() if self._queue else 0,
+            "in_progress": sum(1 for job in self._jobs.values() if job.started_at is not None),
+            "completed": self.completed,
+            "failed": self.failed,
+            "deduplicated": self.deduplicated,
+            "latency_avg": sum(latencias) / len(latencias) if latencias else 0.0,
+            "latency_p95": latencias[int(len(latencias) * 0.95)] if latencias else 0.0,
+        }
+
+    async def stop(self, drain=True, timeout=30):
+        """Para os workers, opcionalmente esperando a fila esvaziar."""
+        if drain and self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Fila '{self.name}' não esvaziou em {timeout}s; jobs restantes serão cancelados")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,285 @@
+"""
+Métricas em memória (contadores, gauges e histogramas de latência) no
+formato de texto do Prometheus.
+
+Cada processo (workers HTTP, processo dos bots e engines) tem seu próprio
+registro. O endpoint /metrics do app junta os snapshots de todos eles via IPC
+(merge) e só então gera o texto (render). Registrar uma chamada custa uma
+busca em dict e um incremento, sem alocações e sem lock: com o GIL, um
+incremento só se perde se duas threads atualizarem a mesma série no mesmo
+instante, o que é aceitável para métricas (cada engine atualiza as suas
+séries de uma única thread na maior parte do tempo).
+
+Uso típico:
+
+    with metrics.timed("gemini", "generate_content"):
+        resposta = model.generate_content(prompt)
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+
+import tracing
+
+# Limites (em segundos) dos buckets de latência: de 5 ms a 30 s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Séries por métrica: além disso, novos rótulos são agrupados em "other" (ex: comandos digitados errado)
+MAX_SERIES = 500
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é o +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    """Família de séries com os mesmos nomes de rótulos."""
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Série com os valores de rótulos dados (na ordem de labelnames); guarde-a para o caminho quente."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                if len(self._children) >= MAX_SERIES and values not in self._children:
+                    values = ("other",) * len(self.labelnames)
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, *values, amount=1):
+        self.labels(*values).inc(amount)
+
+    def _samples(self):
+        return {values: child.value for values, child in list(self._children.items())}
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, *values):
+        self.labels(*values).observe(value)
+
+    def _samples(self):
+        return {values: (list(child.counts), child.sum, child.count)
+                for values, child in list(self._children.items())}
+
+
+class Gauge(_Metric):
+    """Gauge calculado na hora da coleta, a partir de funções registradas por série."""
+
+    type = "gauge"
+
+    def set_function(self, fn, *values):
+        with self._lock:
+            self._children[values] = fn
+
+    def _samples(self):
+        samples = {}
+        for values, fn in list(self._children.items()):
+            try:
+                samples[values] = float(fn())
+            except Exception:
+                continue
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def snapshot(self):
+        """Cópia serializável (pickle) de todas as métricas, para envio por IPC."""
+        return {
+            metric.name: {
+                "type": metric.type,
+                "help": metric.help,
+                "labelnames": metric.labelnames,
+                "buckets": getattr(metric, "buckets", None),
+                "samples": metric._samples(),
+            }
+            for metric in list(self._metrics.values())
+        }
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+gauge = REGISTRY.gauge
+snapshot = REGISTRY.snapshot
+
+upstream_seconds = histogram("upstream_request_seconds", "Latência das chamadas a serviços externos",
+                             ("upstream", "operation"))
+upstream_errors = counter("upstream_errors_total", "Erros nas chamadas a serviços externos, por tipo",
+                          ("upstream", "operation", "error"))
+
+
+class timed:
+    """
+    Mede uma chamada a um serviço externo (Gemini, Helix, YouTube, Blizzard, Sheets).
+
+    Exceções são contadas em upstream_errors_total com o nome da classe;
+    respostas de erro sem exceção (ex: HTTP 500) podem ser registradas com fail().
+    Dentro de um trace, a chamada também vira um span (upstream.operation).
+    """
+
+    __slots__ = ("_histogram", "_upstream", "_operation", "_inicio", "_span")
+
+    def __init__(self, upstream, operation=""):
+        self._upstream = upstream
+        self._operation = operation
+        self._histogram = upstream_seconds.labels(upstream, operation)
+
+    def __enter__(self):
+        self._span = tracing.start_span(f"{self._upstream}.{self._operation}" if self._operation else self._upstream)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._inicio)
+        if exc_type is not None:
+            self.fail(exc_type.__name__)
+        if self._span is not None:
+            self._span.finish(exc)
+        return False
+
+    def fail(self, error):
+        upstream_errors.labels(self._upstream, self._operation, str(error)).inc()
+        if self._span is not None:
+            self._span.set(error=str(error))
+
+    def check_status(self, status_code):
+        """Conta respostas HTTP 4xx/5xx como erro (http_<código>)."""
+        if status_code >= 400:
+            self.fail(f"http_{status_code}")
+
+
+def merge(*snapshots):
+    """Soma os snapshots de vários processos (séries com os mesmos rótulos são somadas)."""
+    resultado = {}
+    for snap in snapshots:
+        for name, family in (snap or {}).items():
+            destino = resultado.get(name)
+            if destino is None:
+                destino = resultado[name] = dict(family, samples={})
+            for values, sample in family["samples"].items():
+                atual = destino["samples"].get(values)
+                if atual is None:
+                    destino["samples"][values] = sample
+                elif family["type"] == "histogram":
+                    destino["samples"][values] = ([a + b for a, b in zip(atual[0], sample[0])],
+                                                  atual[1] + sample[1], atual[2] + sample[2])
+                else:
+                    destino["samples"][values] = atual + sample
+    return resultado
+
+
+def single(name, help, value, type="gauge"):
+    """Snapshot de uma métrica sem rótulos, calculada na hora (ex: disponibilidade de um processo)."""
+    return {name: {"type": type, "help": help, "labelnames": (), "buckets": None, "samples": {(): value}}}
+
+
+def _escape(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labelnames, values, extra=()):
+    pares = [f'{nome}="{_escape(valor)}"' for nome, valor in zip(labelnames, values)]
+    pares.extend(f'{nome}="{valor}"' for nome, valor in extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _number(valor):
+    if valor == math.inf:
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+def render(snap):
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    linhas = []
+    for name in sorted(snap):
+        family = snap[name]
+        linhas.append(f"# HELP {name} {family['help']}")
+        linhas.append(f"# TYPE {name} {family['type']}")
+        labelnames = family["labelnames"]
+        for values in sorted(family["samples"], key=lambda v: tuple(map(str, v))):
+            sample = family["samples"][values]
+            if family["type"] != "histogram":
+                linhas.append(f"{name}{_labels(labelnames, values)} {_number(sample)}")
+                continue
+            counts, total, count = sample
+            acumulado = 0
+            for limite, quantidade in zip(list(family["buckets"]) + [math.inf], counts):
+                acumulado += quantidade
+                linhas.append(f"{name}_bucket{_labels(labelnames, values, [('le', _number(limite))])} {acumulado}")
+            linhas.append(f"{name}_sum{_labels(labelnames, values)} {_number(total)}")
+            linhas.append(f"{name}_count{_labels(labelnames, values)} {count}")
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,414 @@
+"""
+Índice incremental de percentis por métrica.
+
+Cada métrica mantém uma lista ordenada de (valor, chave): a consulta de rank
+é uma busca binária (bisect, O(log n)) e inserções/atualizações usam insort,
+cuja busca também é O(log n) (o deslocamento da lista é um memmove em C).
+Quando a base passa de `sketch_threshold` jogadores, cada métrica (e cada
+partição) é convertida para uma BoundedMetric: as contagens passam a vir de um
+sketch de quantis com erro relativo limitado, que usa memória proporcional ao
+número de faixas de valores, e só os `top_capacity` maiores valores continuam
+exatos, para os rankings. A memória das métricas deixa de crescer com a base.
+
+Para os rankings (!top e !rank) cada métrica também é particionada por classe
+e por classe + especialização.
+"""
+import heapq
+import math
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+class SortedMetric:
+    """Valores exatos de uma métrica, ordenados."""
+
+    def __init__(self):
+        self._items = []
+
+    def add(self, value, key):
+        insort(self._items, (value, key))
+
+    def extend(self, items):
+        """Carga em lote: uma única ordenação em vez de n inserções."""
+        self._items.extend(items)
+        self._items.sort()
+
+    def remove(self, value, key):
+        posicao = bisect_left(self._items, (value, key))
+        if posicao < len(self._items) and self._items[posicao] == (value, key):
+            del self._items[posicao]
+
+    def count_below(self, value):
+        # (value,) é menor que qualquer (value, key), então conta só os estritamente menores
+        return bisect_left(self._items, (value,))
+
+    def count_above(self, value):
+        return len(self._items) - bisect_left(self._items, (math.nextafter(value, math.inf),))
+
+    def descending(self):
+        """Itera (valor, chave) do maior para o menor."""
+        return reversed(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def to_sketch(self, capacity=1000, relative_accuracy=0.01):
+        """Converte para uma BoundedMetric com os mesmos itens."""
+        return BoundedMetric.from_items(self._items, capacity, relative_accuracy)
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis com faixas logarítmicas (no estilo do DDSketch).
+
+    Cada valor positivo cai na faixa ceil(log_gamma(valor)); o rank estimado
+    tem erro relativo de `relative_accuracy` no valor. Dois sketches com a
+    mesma precisão podem ser combinados somando as contagens.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self._buckets = {}
+        self._zero_count = 0
+        self._count = 0
+
+    def _bucket(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def extend(self, items):
+        for value, key in items:
+            self.add(value, key)
+
+    def add(self, value, key=None):
+        if value > 0:
+            bucket = self._bucket(value)
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        else:
+            self._zero_count += 1
+        self._count += 1
+
+    def remove(self, value, key=None):
+        if value > 0:
+            bucket = self._bucket(value)
+            restante = self._buckets.get(bucket, 0) - 1
+            if restante > 0:
+                self._buckets[bucket] = restante
+            else:
+                self._buckets.pop(bucket, None)
+        else:
+            self._zero_count = max(0, self._zero_count - 1)
+        self._count = max(0, self._count - 1)
+
+    def count_below(self, value):
+        if value <= 0:
+            return 0
+        limite = self._bucket(value)
+        return self._zero_count + sum(count for bucket, count in self._buckets.items() if bucket < limite)
+
+    def count_above(self, value):
+        return self._count - self.count_below(math.nextafter(value, math.inf))
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Só é possível combinar sketches com a mesma precisão")
+        for bucket, count in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + count
+        self._zero_count += other._zero_count
+        self._count += other._count
+
+    def __len__(self):
+        return self._count
+
+
+class BoundedMetric:
+    """
+    Métrica com memória limitada: contagens (percentil e posição) estimadas
+    por um QuantileSketch e só os `capacity` maiores (valor, chave) exatos,
+    para os rankings.
+
+    A lista exata contém sempre todos os itens maiores que `_floor` (o maior
+    item já descartado dela). Remoções podem deixá-la com menos de `capacity`
+    itens; o ranking continua exato até o tamanho da lista.
+    """
+
+    def __init__(self, capacity=1000, relative_accuracy=0.01):
+        self.capacity = capacity
+        self._sketch = QuantileSketch(relative_accuracy)
+        self._top = SortedMetric()
+        self._floor = None
+
+    @classmethod
+    def from_items(cls, items, capacity=1000, relative_accuracy=0.01):
+        """Constrói a partir de (valor, chave) já ordenados."""
+        metrica = cls(capacity, relative_accuracy)
+        for value, _ in items:
+            metrica._sketch.add(value)
+        metrica._top.extend(items[-capacity:] if capacity else [])
+        if len(items) > capacity:
+            metrica._floor = items[-capacity - 1]
+        return metrica
+
+    def add(self, value, key):
+        self._sketch.add(value)
+        if self._floor is None or (value, key) > self._floor:
+            self._top.add(value, key)
+            if len(self._top) > self.capacity:
+                self._floor = self._top._items.pop(0)
+
+    def extend(self, items):
+        for value, key in items:
+            self.add(value, key)
+
+    def remove(self, value, key):
+        self._sketch.remove(value)
+        self._top.remove(value, key)
+
+    def count_below(self, value):
+        return self._sketch.count_below(value)
+
+    def count_above(self, value):
+        return self._sketch.count_above(value)
+
+    def descending(self):
+        return self._top.descending()
+
+    def exact_items(self):
+        """Quantos (valor, chave) exatos estão guardados (no máximo `capacity`)."""
+        return len(self._top)
+
+    def __len__(self):
+        return len(self._sketch)
+
+
+def _numero(valor):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+    return numero if math.isfinite(numero) else 0.0
+
+
+def _texto(valor):
+    return "" if valor is None else str(valor).strip()
+
+
+class PercentileIndex:
+    """
+    Percentis e rankings de várias métricas sobre a base de jogadores.
+
+    Args:
+        metrics: Nomes das colunas numéricas indexadas
+        sketch_threshold: Tamanho da base a partir do qual as métricas viram sketches
+        top_capacity: Valores exatos mantidos por métrica/partição depois da conversão
+    """
+
+    def __init__(self, metrics, sketch_threshold=200000, top_capacity=1000):
+        self.metrics = list(metrics)
+        self.sketch_threshold = sketch_threshold
+        self.top_capacity = top_capacity
+        self._sketched = False
+        self._structures = {metric: SortedMetric() for metric in self.metrics}
+        # Partições por métrica: (classe, None) e (classe, especialização) -> SortedMetric (ou BoundedMetric)
+        self._partitions = {metric: {} for metric in self.metrics}
+        self._values = {}  # chave -> tupla com o valor de cada métrica
+        self._info = {}  # chave -> (classe, especialização, nome, realm)
+        self._by_name = {}  # nome normalizado (início da chave) -> chaves
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _info_from(record):
+        return (_texto(record.get("Class")), _texto(record.get("Specialization")),
+                _texto(record.get("Character Name")), _texto(record.get("Realm")))
+
+    @staticmethod
+    def _groups_of(info):
+        classe, spec = info[0], info[1]
+        return ((classe, None), (classe, spec))
+
+    def _set_info(self, key, info):
+        if key not in self._info:
+            # As chaves começam pelo nome já normalizado (ver wow_comparative.player_key)
+            self._by_name.setdefault(key.split("_", 1)[0], set()).add(key)
+        self._info[key] = info
+
+    def _forget_name(self, key):
+        nome = key.split("_", 1)[0]
+        chaves = self._by_name.get(nome)
+        if chaves is not None:
+            chaves.discard(key)
+            if not chaves:
+                del self._by_name[nome]
+
+    def _partition(self, metric, group):
+        particao = self._partitions[metric].get(group)
+        if particao is None:
+            particao = BoundedMetric(self.top_capacity) if self._sketched else SortedMetric()
+            self._partitions[metric][group] = particao
+        return particao
+
+    @classmethod
+    def from_rows(cls, rows, metrics, **kwargs):
+        """Constrói o índice a partir de (key, record), como retornado por PlayerStore.rows()."""
+        index = cls(metrics, **kwargs)
+        index.update_many(rows)
+        return index
+
+    def update(self, key, record):
+        """Insere ou atualiza um jogador."""
+        self.update_many([(key, record)])
+
+    def update_many(self, items):
+        with self._lock:
+            if not self._values:
+                self._bulk_load(items)
+                return
+            for key, record in items:
+                novos = tuple(_numero(record.get(metric)) for metric in self.metrics)
+                info = self._info_from(record)
+                antigos = self._values.get(key)
+                info_antiga = self._info.get(key)
+                if antigos == novos and info_antiga == info:
+                    continue
+                for metric, antigo, novo in zip(self.metrics, antigos or (None,) * len(novos), novos):
+                    estrutura = self._structures[metric]
+                    if antigo is not None:
+                        estrutura.remove(antigo, key)
+                        for grupo in self._groups_of(info_antiga):
+                            self._partition(metric, grupo).remove(antigo, key)
+                    estrutura.add(novo, key)
+                    for grupo in self._groups_of(info):
+                        self._partition(metric, grupo).add(novo, key)
+                self._values[key] = novos
+                self._set_info(key, info)
+            self._maybe_convert_to_sketch()
+
+    def _bulk_load(self, items):
+        for key, record in items:
+            self._values[key] = tuple(_numero(record.get(metric)) for metric in self.metrics)
+            self._set_info(key, self._info_from(record))
+        # Grupos montados só no fim: uma chave repetida em `items` entra uma vez, no grupo final
+        grupos = {}
+        for key, info in self._info.items():
+            for grupo in self._groups_of(info):
+                grupos.setdefault(grupo, []).append(key)
+        for posicao, metric in enumerate(self.metrics):
+            self._structures[metric].extend((valores[posicao], key) for key, valores in self._values.items())
+            for grupo, keys in grupos.items():
+                self._partition(metric, grupo).extend((self._values[key][posicao], key) for key in keys)
+        self._maybe_convert_to_sketch()
+
+    def remove(self, key):
+        with self._lock:
+            antigos = self._values.pop(key, None)
+            info = self._info.pop(key, None)
+            if info is not None:
+                self._forget_name(key)
+            if antigos is not None:
+                for metric, antigo in zip(self.metrics, antigos):
+                    self._structures[metric].remove(antigo, key)
+                    for grupo in self._groups_of(info):
+                        self._partition(metric, grupo).remove(antigo, key)
+
+    def _maybe_convert_to_sketch(self):
+        if self._sketched or len(self._values) < self.sketch_threshold:
+            return
+        for metric in self.metrics:
+            self._structures[metric] = self._structures[metric].to_sketch(self.top_capacity)
+            particoes = self._partitions[metric]
+            for grupo, particao in particoes.items():
+                particoes[grupo] = particao.to_sketch(self.top_capacity)
+        self._sketched = True
+
+    def exact_items(self):
+        """Total de (valor, chave) exatos guardados nas métricas e partições (cresce com a base até a conversão)."""
+        with self._lock:
+            total = 0
+            for metric in self.metrics:
+                for estrutura in [self._structures[metric], *self._partitions[metric].values()]:
+                    total += estrutura.exact_items() if self._sketched else len(estrutura)
+            return total
+
+    def percentile(self, metric, value):
+        """Percentual de jogadores com valor estritamente menor na métrica."""
+        with self._lock:
+            total = len(self._values)
+            if not total:
+                return None
+            return self._structures[metric].count_below(_numero(value)) * 100 / total
+
+    def percentiles_for(self, key, metrics=None):
+        """Percentis de um jogador já indexado em várias métricas, ou None se não estiver na base."""
+        with self._lock:
+            valores = self._values.get(key)
+            total = len(self._values)
+            if valores is None or not total:
+                return None
+            resultado = {}
+            for metric, valor in zip(self.metrics, valores):
+                if metrics is None or metric in metrics:
+                    resultado[metric] = self._structures[metric].count_below(valor) * 100 / total
+            return resultado
+
+    def _ranked(self, metric, classe=None, spec=None):
+        """Estruturas cuja união é o grupo pedido: a partição da classe/especialização ou a métrica geral."""
+        if classe is not None:
+            particao = self._partitions[metric].get((classe, spec))
+            return [particao] if particao else []
+        return [self._structures[metric]]
+
+    def top(self, metric, n=10, classe=None, spec=None):
+        """
+        Os n maiores valores da métrica, opcionalmente filtrados por classe e especialização.
+        Retorna lista de (key, nome, realm, valor).
+        """
+        with self._lock:
+            fontes = [estrutura.descending() for estrutura in self._ranked(metric, classe, spec)]
+            melhores = islice(heapq.merge(*fontes, reverse=True), n)
+            return [(key, self._info[key][2], self._info[key][3], valor) for valor, key in melhores]
+
+    def rank(self, key, metric):
+        """
+        Posição do jogador na métrica: no geral, na classe e na especialização.
+        Retorna {"geral"/"classe"/"spec": (posição, total, nome do grupo)}, ou None se não estiver na base.
+        """
+        with self._lock:
+            valores = self._values.get(key)
+            if valores is None:
+                return None
+            valor = valores[self.metrics.index(metric)]
+            classe, spec = self._info[key][:2]
+            grupos = [("geral", None, None, None)]
+            if classe:
+                grupos.append(("classe", classe, None, classe))
+                if spec:
+                    grupos.append(("spec", classe, spec, f"{spec} {classe}"))
+            resultado = {}
+            for nome, filtro_classe, filtro_spec, rotulo in grupos:
+                estruturas = self._ranked(metric, filtro_classe, filtro_spec)
+                total = sum(len(estrutura) for estrutura in estruturas)
+                if total:
+                    posicao = sum(estrutura.count_above(valor) for estrutura in estruturas) + 1
+                    resultado[nome] = (posicao, total, rotulo)
+            return resultado
+
+    def find(self, nome):
+        """Chaves dos jogadores com esse nome, já normalizado como em player_key (clean_name)."""
+        with self._lock:
+            return sorted(self._by_name.get(nome, ()))
+
+    def groups(self):
+        """Classes e especializações presentes na base: {classe: {especializações}}."""
+        with self._lock:
+            grupos = {}
+            for classe, spec in self._partitions[self.metrics[0]] if self.metrics else ():
+                if classe:
+                    especializacoes = grupos.setdefault(classe, set())
+                    if spec:
+                        especializacoes.add(spec)
+            return grupos
+
+    def __len__(self):
+        return len(self._values)
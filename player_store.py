@@ -0,0 +1,162 @@
+"""
+Espelho local (SQLite) da planilha de jogadores.
+
+Todas as leituras e consultas de percentil do !compare são feitas aqui, sem
+baixar a planilha. A sincronização com o Google Sheets acontece em segundo
+plano (ver wow_comparative.SheetsSync): linhas alteradas localmente ficam
+marcadas como "dirty" até serem enviadas para a planilha.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+
+def _quote(coluna):
+    """Coloca o nome da coluna entre aspas (os nomes da planilha têm espaços)."""
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+class PlayerStore:
+    """
+    Tabela colunar de jogadores, uma coluna por cabeçalho da planilha.
+
+    Args:
+        path: Caminho do arquivo SQLite (":memory:" para testes)
+        columns: Colunas na ordem da planilha
+        numeric_columns: Colunas armazenadas como número (usadas em percentis)
+        indexed_columns: Colunas numéricas com índice para consultas de rank
+    """
+
+    def __init__(self, path, columns, numeric_columns=(), indexed_columns=()):
+        self.path = path
+        self.columns = list(columns)
+        self.numeric_columns = set(numeric_columns)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema(indexed_columns)
+
+    def _create_schema(self, indexed_columns):
+        definicoes = ", ".join(
+            f"{_quote(coluna)} {'REAL' if coluna in self.numeric_columns else 'TEXT'}"
+            for coluna in self.columns
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS players (key TEXT PRIMARY KEY, {definicoes}, "
+                "dirty INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Colunas novas (adicionadas ao código depois da criação do arquivo)
+            existentes = {linha[1] for linha in self._conn.execute("PRAGMA table_info(players)")}
+            for coluna in self.columns:
+                if coluna not in existentes:
+                    tipo = "REAL" if coluna in self.numeric_columns else "TEXT"
+                    self._conn.execute(f"ALTER TABLE players ADD COLUMN {_quote(coluna)} {tipo}")
+            for coluna in indexed_columns:
+                nome_indice = "idx_" + "".join(c if c.isalnum() else "_" for c in coluna.lower())
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {nome_indice} ON players ({_quote(coluna)})")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dirty ON players (dirty)")
+
+    def _normalize(self, coluna, valor):
+        if coluna in self.numeric_columns:
+            try:
+                numero = float(valor)
+            except (TypeError, ValueError):
+                return 0
+            return numero if math.isfinite(numero) else 0
+        if valor is None:
+            return ""
+        return str(valor)
+
+    def _record(self, valores):
+        """Monta o dict do registro; números inteiros voltam como int (ex: Level 70, não 70.0)."""
+        return {
+            coluna: int(valor) if isinstance(valor, float) and valor.is_integer() else valor
+            for coluna, valor in zip(self.columns, valores)
+        }
+
+    def _row_values(self, record):
+        return [self._normalize(coluna, record.get(coluna)) for coluna in self.columns]
+
+    def upsert(self, key, record, dirty=True):
+        """Insere ou atualiza um jogador; por padrão a linha fica pendente de envio à planilha."""
+        self.upsert_many([(key, record)], dirty=dirty)
+
+    def upsert_many(self, items, dirty=False, overwrite_dirty=True):
+        """
+        Insere ou atualiza vários jogadores em uma única transação.
+
+        Args:
+            items: Iterável de (key, record)
+            dirty: Marca as linhas como pendentes de envio à planilha
+            overwrite_dirty: Se False, linhas locais ainda não enviadas são preservadas
+                (usado ao importar os dados da planilha)
+        """
+        colunas = ", ".join(_quote(coluna) for coluna in self.columns)
+        marcadores = ", ".join("?" for _ in range(len(self.columns) + 2))
+        atualizacoes = ", ".join(f"{_quote(coluna)} = excluded.{_quote(coluna)}" for coluna in self.columns)
+        sql = (
+            f"INSERT INTO players (key, {colunas}, dirty) VALUES ({marcadores}) "
+            f"ON CONFLICT(key) DO UPDATE SET {atualizacoes}, dirty = excluded.dirty"
+        )
+        if not overwrite_dirty:
+            sql += " WHERE players.dirty = 0"
+        # "dirty" guarda a versão da escrita local (0 = sincronizada), para que uma linha
+        # alterada durante o envio à planilha não seja marcada como limpa por engano
+        versao = time.time_ns() if dirty else 0
+        linhas = [[key] + self._row_values(record) + [versao] for key, record in items]
+        with self._lock, self._conn:
+            self._conn.executemany(sql, linhas)
+
+    def get(self, key):
+        """Retorna o registro do jogador como dict, ou None."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(_quote(c) for c in self.columns)} FROM players WHERE key = ?", (key,)
+            )
+            linha = cursor.fetchone()
+        return self._record(linha) if linha else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+    def rows(self):
+        """Retorna todos os jogadores como lista de (key, record)."""
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT key, {', '.join(_quote(c) for c in self.columns)} FROM players"
+            ).fetchall()
+        return [(linha[0], self._record(linha[1:])) for linha in linhas]
+
+    def oldest(self, coluna, limit):
+        """Os `limit` jogadores com o menor valor na coluna (ex: os atualizados há mais tempo)."""
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT key, {', '.join(_quote(c) for c in self.columns)} FROM players "
+                f"ORDER BY {_quote(coluna)} ASC LIMIT ?", (int(limit),)
+            ).fetchall()
+        return [(linha[0], self._record(linha[1:])) for linha in linhas]
+
+    def dirty_rows(self, limit=None):
+        """
+        Linhas alteradas localmente e ainda não enviadas à planilha.
+        Retorna lista de (key, record, versão); a versão deve ser repassada a mark_clean.
+        """
+        sql = f"SELECT key, dirty, {', '.join(_quote(c) for c in self.columns)} FROM players WHERE dirty != 0"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            linhas = self._conn.execute(sql).fetchall()
+        return [(linha[0], self._record(linha[2:]), linha[1]) for linha in linhas]
+
+    def mark_clean(self, versions):
+        """Marca como sincronizadas as linhas de (key, versão) que não mudaram desde a leitura."""
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE players SET dirty = 0 WHERE key = ? AND dirty = ?", list(versions))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,143 @@
+"""
+Índice local dos realms de uma região, para validar o !compare sem chamar a API.
+
+Os slugs ficam em uma lista ordenada: a busca por prefixo é uma busca binária
+(bisect), e quando nada começa com o texto digitado as sugestões vêm da
+distância de edição contra os slugs (algumas centenas por região). O índice
+é salvo em disco e recarregado da API da Blizzard uma vez por dia.
+"""
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+
+from unidecode import unidecode
+
+_NAO_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+def slugify(texto):
+    """Mesmo formato de wow_comparative.clean_name: minúsculas, sem acentos, hífens."""
+    return _NAO_SLUG.sub("-", unidecode(str(texto)).lower()).strip("-")
+
+
+def edit_distance(a, b, limite=None):
+    """Distância de Levenshtein; retorna limite + 1 assim que o limite é ultrapassado."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limite is not None and len(a) - len(b) > limite:
+        return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if limite is not None and min(atual) > limite:
+            return limite + 1
+        anterior = atual
+    return anterior[-1]
+
+
+class RealmIndex:
+    """
+    Realms de uma região, indexados por slug.
+
+    Args:
+        realms: Iterável de (slug, nome)
+        fetched_at: Momento (epoch) em que a lista foi obtida da API
+    """
+
+    def __init__(self, realms, fetched_at=None):
+        self.names = {}
+        for slug, nome in realms:
+            self.names[slug] = nome
+        # Nomes que não batem com o slug (ex: "Aman'Thul" -> aman-thul vs amanthul)
+        self._aliases = {}
+        for slug, nome in self.names.items():
+            alias = slugify(nome)
+            if alias and alias not in self.names:
+                self._aliases[alias] = slug
+        self._sorted = sorted(self.names)
+        self.fetched_at = fetched_at or time.time()
+
+    @classmethod
+    def from_api(cls, data):
+        """Constrói o índice a partir da resposta de /data/wow/realm/index."""
+        realms = [(realm["slug"], realm.get("name") or realm["slug"])
+                  for realm in data.get("realms", []) if realm.get("slug")]
+        return cls(realms)
+
+    def is_stale(self, max_age):
+        return time.time() - self.fetched_at >= max_age
+
+    def __contains__(self, slug):
+        return slug in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def by_prefix(self, prefixo, limite=5):
+        """Slugs que começam com o prefixo, em ordem alfabética."""
+        inicio = bisect_left(self._sorted, prefixo)
+        encontrados = []
+        for slug in self._sorted[inicio:inicio + limite]:
+            if not slug.startswith(prefixo):
+                break
+            encontrados.append(slug)
+        return encontrados
+
+    def suggest(self, texto, limite=3):
+        """Slugs parecidos com o texto: por prefixo e, se não houver, por distância de edição."""
+        slug = slugify(texto)
+        if not slug:
+            return []
+        encontrados = self.by_prefix(slug, limite)
+        if encontrados:
+            return encontrados
+        distancia_maxima = max(1, len(slug) // 3)
+        candidatos = []
+        for candidato in self._sorted:
+            distancia = edit_distance(slug, candidato, distancia_maxima)
+            if distancia <= distancia_maxima:
+                candidatos.append((distancia, candidato))
+        candidatos.sort()
+        return [candidato for _, candidato in candidatos[:limite]]
+
+    def resolve(self, texto):
+        """
+        Valida o realm digitado.
+
+        Returns:
+            Tuple (slug corrigido ou None, sugestões). O slug só é corrigido
+            automaticamente quando há exatamente uma sugestão.
+        """
+        slug = slugify(texto)
+        if slug in self.names:
+            return slug, []
+        if slug in self._aliases:
+            return self._aliases[slug], []
+        sugestoes = self.suggest(slug)
+        if len(sugestoes) == 1:
+            return sugestoes[0], []
+        return None, sugestoes
+
+    def save(self, path):
+        """Grava o índice em disco (escrita atômica)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "realms": list(self.names.items())}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carrega o índice do disco, ou retorna None se o arquivo não existir ou estiver inválido."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["realms"], data["fetched_at"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Não foi possível carregar o índice de realms {path}: {e}")
+            return None
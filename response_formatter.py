@@ -0,0 +1,95 @@
+"""
+Formatação das respostas da IA antes de enviá-las ao chat.
+
+O padrão de quebras de linha é pré-compilado e aplicado em uma única passada;
+o corte respeita o limite de palavras, e cada plataforma tem seu perfil
+(tamanho máximo, remoção de markdown e prefixo).
+"""
+import re
+
+# Um único padrão pré-compilado trata as quebras de linha, junto com os espaços
+# ao redor e um eventual marcador de lista no início da linha seguinte
+_PADRAO_QUEBRAS = re.compile(r"\n\s*(?:([*\-•])\s+)?")
+
+# Marcações de markdown de um caractere; "**", "__" e "##" caem no mesmo caso.
+# São removidas com str.replace, que é bem mais rápido que uma alternativa no regex
+_MARCACOES_MARKDOWN = ("*", "_", "#", "`")
+
+
+def _substituir_quebra(match):
+    if match.group(1) is None:
+        return " "
+    # Item de lista vira uma frase, sem duplicar a pontuação anterior
+    inicio = match.start()
+    if inicio and match.string[inicio - 1] in ".:;!?":
+        return " "
+    return ". "
+
+
+class PerfilFormatacao:
+    """
+    Perfil de formatação de uma plataforma.
+
+    Args:
+        nome: Nome da plataforma
+        max_length: Tamanho máximo da mensagem final, incluindo o prefixo
+        strip_markdown: Remove marcações de markdown (o chat não as renderiza)
+        prefixo: Prefixo fixo da resposta (ex: "[IA] ")
+        prefixo_autor: Prefixo usado quando o autor é informado (ex: "[IA para {autor}] ")
+        reticencias: Sufixo adicionado quando o texto é cortado
+    """
+
+    __slots__ = ("nome", "max_length", "strip_markdown", "prefixo", "prefixo_autor", "reticencias")
+
+    def __init__(self, nome, max_length, strip_markdown=True, prefixo="", prefixo_autor=None, reticencias="..."):
+        self.nome = nome
+        self.max_length = max_length
+        self.strip_markdown = strip_markdown
+        self.prefixo = prefixo
+        self.prefixo_autor = prefixo_autor
+        self.reticencias = reticencias
+
+    def montar_prefixo(self, autor=None):
+        if autor and self.prefixo_autor:
+            return self.prefixo_autor.format(autor=autor)
+        return self.prefixo
+
+
+# Limites das plataformas: 500 caracteres na Twitch e 200 no chat do YouTube
+PERFIL_TWITCH = PerfilFormatacao("twitch", max_length=500, prefixo="[IA] ")
+PERFIL_YOUTUBE = PerfilFormatacao("youtube", max_length=200, prefixo_autor="[IA para {autor}] ")
+
+
+def truncar(texto, limite, reticencias="..."):
+    """Corta o texto em até `limite` caracteres, sem quebrar a última palavra."""
+    if len(texto) <= limite:
+        return texto
+    corte = texto[:max(0, limite - len(reticencias))]
+    espaco = corte.rfind(" ")
+    # Só recua até o espaço se isso não descartar uma parte grande do texto
+    if espaco > len(corte) // 2:
+        corte = corte[:espaco]
+    return corte.rstrip(" .,;:-") + reticencias
+
+
+def formatar_resposta(texto, perfil, autor=None):
+    """
+    Limpa e ajusta uma resposta ao perfil da plataforma.
+
+    Args:
+        texto: Texto gerado pela IA
+        perfil: PerfilFormatacao da plataforma
+        autor: Nome do usuário que fez a pergunta (opcional)
+
+    Returns:
+        str: Mensagem pronta para ser enviada
+    """
+    if "\n" in texto:
+        texto = _PADRAO_QUEBRAS.sub(_substituir_quebra, texto)
+    if perfil.strip_markdown:
+        for marcacao in _MARCACOES_MARKDOWN:
+            if marcacao in texto:
+                texto = texto.replace(marcacao, "")
+    texto = texto.strip()
+    prefixo = perfil.montar_prefixo(autor)
+    return prefixo + truncar(texto, perfil.max_length - len(prefixo), perfil.reticencias)
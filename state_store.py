@@ -0,0 +1,229 @@
+"""
+Estado de execução dos bots persistido em SQLite (modo WAL), para que um
+reinício não perca cooldowns, IDs já processados e o cursor do chat do
+YouTube, tokens da Twitch e da Blizzard e o cache de respostas da Blizzard.
+
+O estado fica em memória, dividido em namespaces (StateMap, com a interface
+de um dict). Escrever só altera o dict e marca a chave como alterada; uma
+thread grava as alterações em lote a cada STATE_SNAPSHOT_INTERVAL segundos
+(snapshot), e flush() grava na hora quando a perda não é aceitável (cursor do
+YouTube, tokens recém-obtidos). No boot cada namespace é carregado com uma
+única consulta, já sem as chaves expiradas.
+
+Cada processo (engines da Twitch e do YouTube) abre o mesmo arquivo; o WAL
+permite leituras e escritas concorrentes entre processos. No Render o arquivo
+só sobrevive a um redeploy se STATE_STORE_PATH estiver em um disco persistente;
+sem disco, ele ainda vale para reinícios das engines e do processo dos bots.
+STATE_STORE_PATH=":memory:" desativa a persistência.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = float(os.getenv("STATE_SNAPSHOT_INTERVAL", "10"))
+
+
+class StateMap:
+    """
+    Namespace do estado: um dict em memória cujas alterações são gravadas no
+    próximo snapshot. Valores precisam ser serializáveis em JSON; um valor
+    alterado no lugar (ex: um campo de um dict) só é gravado se a chave for
+    atribuída de novo.
+
+    Args:
+        name: Nome do namespace
+        ttl: Segundos, a partir da gravação, após os quais a chave não é mais
+            carregada (None: nunca expira)
+        items: Conteúdo carregado do disco
+    """
+
+    def __init__(self, name, ttl=None, items=None):
+        self.name = name
+        self.ttl = ttl
+        self._data = dict(items or {})
+        self._dirty = set()
+        self._deleted = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def items(self):
+        return list(self._data.items())
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._dirty.add(key)
+            self._deleted.discard(key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._dirty.discard(key)
+            self._deleted.add(key)
+            return self._data.pop(key)
+
+    def __delitem__(self, key):
+        if key not in self._data:
+            raise KeyError(key)
+        self.pop(key)
+
+    def _take_changes(self):
+        """Retorna (alterados, removidos) desde o último snapshot e zera a marcação."""
+        with self._lock:
+            alterados = {key: self._data[key] for key in self._dirty}
+            removidos = self._deleted
+            self._dirty = set()
+            self._deleted = set()
+        return alterados, removidos
+
+    def _restore_changes(self, alterados, removidos):
+        """Volta a marcar as chaves de um snapshot que falhou (se não mudaram desde então)."""
+        with self._lock:
+            self._dirty.update(key for key in alterados if key in self._data and key not in self._deleted)
+            self._deleted.update(key for key in removidos if key not in self._data)
+
+
+class StateStore:
+    """
+    Arquivo SQLite com os namespaces do estado de um processo.
+
+    Args:
+        path: Caminho do arquivo SQLite (":memory:" para não persistir)
+        snapshot_interval: Segundos entre os snapshots automáticos (0 desativa a thread)
+    """
+
+    def __init__(self, path, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self._maps = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"snapshots": 0, "keys_written": 0, "errors": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS state (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                "value TEXT NOT NULL, expires_at REAL, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+
+    def namespace(self, name, ttl=None):
+        """Retorna o StateMap do namespace, carregando-o do disco no primeiro uso."""
+        state_map = self._maps.get(name)
+        if state_map is not None:
+            return state_map
+        with self._lock:
+            state_map = self._maps.get(name)
+            if state_map is None:
+                with self._flush_lock:
+                    linhas = self._conn.execute(
+                        "SELECT key, value FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                        (name, time.time()),
+                    ).fetchall()
+                items = {}
+                for key, value in linhas:
+                    try:
+                        items[key] = json.loads(value)
+                    except ValueError:
+                        continue
+                state_map = self._maps[name] = StateMap(name, ttl, items)
+        return state_map
+
+    def flush(self):
+        """Grava as alterações de todos os namespaces em uma única transação; retorna quantas chaves."""
+        with self._flush_lock:
+            agora = time.time()
+            mudancas = [(state_map, *state_map._take_changes()) for state_map in list(self._maps.values())]
+            linhas, remocoes = [], []
+            for state_map, alterados, removidos in mudancas:
+                expira = agora + state_map.ttl if state_map.ttl is not None else None
+                for key, value in alterados.items():
+                    linhas.append((state_map.name, key, json.dumps(value, separators=(",", ":")), expira))
+                remocoes.extend((state_map.name, key) for key in removidos)
+            try:
+                with self._conn:
+                    if linhas:
+                        self._conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)", linhas)
+                    if remocoes:
+                        self._conn.executemany("DELETE FROM state WHERE namespace = ? AND key = ?", remocoes)
+                    self._conn.execute("DELETE FROM state WHERE expires_at <= ?", (agora,))
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                # Tenta de novo no próximo snapshot
+                for state_map, alterados, removidos in mudancas:
+                    state_map._restore_changes(alterados, removidos)
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Não foi possível gravar o estado em {self.path}: {e}")
+                return 0
+            self.stats["snapshots"] += 1
+            self.stats["keys_written"] += len(linhas) + len(remocoes)
+            return len(linhas) + len(remocoes)
+
+    def start(self):
+        """Inicia a thread de snapshots periódicos."""
+        if self._thread is not None or not self.snapshot_interval:
+            return
+        self._thread = threading.Thread(target=self._run, name="state-snapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.flush()
+
+    def close(self):
+        """Grava as últimas alterações e fecha o arquivo."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._flush_lock:
+            self._conn.close()
+
+
+# Um store por processo, compartilhado pelos bots e pelo wow_comparative
+_store = None
+_store_lock = threading.Lock()
+
+
+def open_state_store(path=None):
+    """Retorna o StateStore do processo (STATE_STORE_PATH), criando-o e iniciando os snapshots no primeiro uso."""
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            path = path or os.getenv("STATE_STORE_PATH", "state.db")
+            try:
+                store = StateStore(path)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Não foi possível abrir o estado em {path}; usando só a memória: {e}")
+                store = StateStore(":memory:")
+            store.start()
+            # Saídas normais gravam o último snapshot; as engines também chamam flush() ao parar
+            atexit.register(store.close)
+            _store = store
+    return _store
@@ -0,0 +1,247 @@
+"""
+Supervisor das engines dos bots: início, parada graciosa, reinício com
+backoff exponencial após quedas e um snapshot de status sem locks.
+
+Cada serviço (twitch, youtube) tem um lock próprio para as operações de ciclo
+de vida (start, stop, restart), então um /restart do YouTube não espera a
+fila do !compare da Twitch esvaziar. O estado de cada serviço é uma tupla
+imutável (EngineState); a cada mudança o supervisor monta um novo mapeamento
+e troca a referência de uma vez só. Quem lê o status (/status, /) só pega a
+referência atual, sem lock e sem consultar as engines.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+import metrics
+from engines import create_engine
+
+logger = logging.getLogger(__name__)
+
+_engine_up = metrics.gauge("bot_engine_up", "1 se a engine está rodando", ("service",))
+_engine_restarts = metrics.gauge("bot_engine_restarts", "Reinícios da engine desde o início do processo",
+                                 ("service",))
+
+
+_CAMPOS_ESTADO = ("status", "desired", "restarts", "failures", "last_error", "started_at", "next_restart_at",
+                  "details")
+
+
+class EngineState(namedtuple("EngineState", _CAMPOS_ESTADO,
+                             defaults=("stopped", "stopped", 0, 0, None, None, None, MappingProxyType({})))):
+    """
+    Estado de um serviço em um instante (imutável).
+
+    `desired` é o que foi pedido ("running" ou "stopped"); `failures` conta as
+    quedas seguidas e é zerado depois que a engine fica estável.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        dados = self._asdict()
+        dados["details"] = dict(self.details)
+        return dados
+
+
+class Supervisor:
+    """
+    Dono do ciclo de vida das engines.
+
+    Args:
+        services: Nomes das engines supervisionadas
+        engine_factory: Função que cria a engine de um serviço (padrão: engines.create_engine)
+        backoff_base: Espera (s) antes do primeiro reinício após uma queda
+        backoff_max: Espera máxima (s) entre reinícios
+        stable_after: Tempo (s) rodando sem cair para zerar a contagem de quedas
+        interval: Intervalo (s) entre as verificações do monitor
+        stop_timeout: Tempo (s) que a parada graciosa pode levar antes de forçar o encerramento
+    """
+
+    def __init__(self, services=("twitch", "youtube"), engine_factory=create_engine, backoff_base=5,
+                 backoff_max=300, stable_after=600, interval=2, stop_timeout=30):
+        self.engine_factory = engine_factory
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.interval = interval
+        self.stop_timeout = stop_timeout
+        self._engines = {service: None for service in services}
+        self._locks = {service: threading.Lock() for service in services}
+        self._write_lock = threading.Lock()
+        self._snapshot = MappingProxyType({service: EngineState() for service in services})
+        self._shutdown = threading.Event()
+        self._monitor = None
+        for service in services:
+            _engine_up.set_function(lambda service=service: self._snapshot[service].status == "running", service)
+            _engine_restarts.set_function(lambda service=service: self._snapshot[service].restarts, service)
+
+    # ---- snapshot ----
+
+    def snapshot(self):
+        """Estado atual de todos os serviços (mapeamento imutável; leitura sem lock)."""
+        return self._snapshot
+
+    def state(self, service):
+        return self._snapshot[service]
+
+    def _set(self, service, **campos):
+        # Só a escrita é serializada: cada mudança publica um mapeamento novo
+        with self._write_lock:
+            estados = dict(self._snapshot)
+            estados[service] = estados[service]._replace(**campos)
+            self._snapshot = MappingProxyType(estados)
+
+    # ---- ciclo de vida ----
+
+    def start(self, service):
+        """
+        Inicia a engine do serviço, se ela ainda não estiver rodando.
+
+        Uma engine viva mas parada ou com erro (ex: não parou dentro do tempo)
+        é trocada por uma nova.
+
+        Returns:
+            True se uma engine foi iniciada; False se ela já estava rodando
+        """
+        with self._locks[service]:
+            engine = self._engines[service]
+            if engine is not None and engine.is_alive():
+                status = engine.status()
+                if status in ("running", "starting"):
+                    self._set(service, desired="running")
+                    return False
+                logger.info(f"🔁 Engine {service} está viva mas com status {status}; iniciando uma nova")
+                self._stop_locked(service)
+                self._start_locked(service, restarts=self._snapshot[service].restarts + 1, failures=0)
+                return True
+            self._start_locked(service, failures=0)
+            return True
+
+    def _start_locked(self, service, **campos):
+        engine = self.engine_factory(service)
+        self._engines[service] = engine
+        engine.start()
+        self._set(service, status="starting", desired="running", started_at=time.time(),
+                  next_restart_at=None, **campos)
+
+    def stop(self, service, timeout=None):
+        """
+        Para a engine do serviço esvaziando suas filas.
+
+        Returns:
+            True se a engine parou dentro do tempo
+        """
+        with self._locks[service]:
+            self._set(service, desired="stopped", next_restart_at=None)
+            return self._stop_locked(service, timeout)
+
+    def _stop_locked(self, service, timeout=None):
+        engine = self._engines[service]
+        if engine is None:
+            self._set(service, status="stopped")
+            return True
+        self._set(service, status="stopping")
+        logger.info(f"🛑 Parando a engine {service}...")
+        parou = engine.stop(self.stop_timeout if timeout is None else timeout)
+        if parou:
+            self._engines[service] = None
+            self._set(service, status="stopped", details=MappingProxyType({}))
+            logger.info(f"✅ Engine {service} parada")
+        else:
+            # Uma thread que não parou continua registrada para não haver duas engines da mesma plataforma
+            self._set(service, status="error: não parou dentro do tempo")
+            logger.warning(f"⚠️ Engine {service} não parou dentro do tempo")
+        return parou
+
+    def restart(self, service):
+        """Para (graciosamente) e inicia de novo a engine do serviço."""
+        with self._locks[service]:
+            self._stop_locked(service)
+            engine = self._engines[service]
+            if engine is not None and engine.is_alive():
+                logger.warning(f"⚠️ A engine {service} anterior ainda está rodando; iniciando outra mesmo assim")
+            restarts = self._snapshot[service].restarts + 1
+            self._start_locked(service, restarts=restarts, failures=0)
+
+    def collect(self, kind):
+        """Coleta "metrics" ou "traces" das engines que rodam em processos próprios."""
+        coletados = []
+        for service, engine in list(self._engines.items()):
+            if engine is not None and engine.is_alive():
+                dados = getattr(engine, kind)()
+                if dados:
+                    coletados.append(dados)
+        return coletados
+
+    # ---- monitor ----
+
+    def start_monitor(self):
+        """Inicia a thread que atualiza o snapshot e reinicia engines que caíram."""
+        if self._monitor is not None:
+            return
+        self._monitor = threading.Thread(target=self._run_monitor, name="supervisor", daemon=True)
+        self._monitor.start()
+
+    def _run_monitor(self):
+        while not self._shutdown.wait(self.interval):
+            for service in self._engines:
+                try:
+                    self.check(service)
+                except Exception as e:
+                    logger.error(f"❌ Erro ao verificar a engine {service}: {e}")
+
+    def _backoff(self, failures):
+        return min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+
+    def check(self, service):
+        """Atualiza o estado do serviço e agenda (ou executa) o reinício após uma queda."""
+        # Não bloqueia o monitor enquanto um start/stop/restart está em andamento
+        if not self._locks[service].acquire(blocking=False):
+            return
+        try:
+            estado = self._snapshot[service]
+            engine = self._engines[service]
+            agora = time.time()
+
+            if estado.next_restart_at is not None:
+                if estado.desired == "running" and agora >= estado.next_restart_at:
+                    logger.info(f"🔁 Reiniciando a engine {service} (queda {estado.failures})")
+                    self._start_locked(service, restarts=estado.restarts + 1)
+                return
+
+            if engine is None:
+                return
+            status = engine.status()
+            if engine.is_alive():
+                campos = {"status": status, "details": MappingProxyType(engine.details())}
+                if estado.failures and estado.started_at and agora - estado.started_at >= self.stable_after:
+                    campos["failures"] = 0
+                self._set(service, **campos)
+                return
+
+            # A engine terminou sem que a parada tivesse sido pedida
+            self._engines[service] = None
+            if status == "disabled" or estado.desired != "running":
+                self._set(service, status=status, desired="stopped", details=MappingProxyType({}))
+                return
+            failures = estado.failures + 1
+            espera = self._backoff(failures)
+            logger.warning(f"⚠️ Engine {service} caiu ({status}); reiniciando em {espera:.0f}s")
+            self._set(service, status=status, failures=failures, last_error=status,
+                      next_restart_at=agora + espera, details=MappingProxyType({}))
+        finally:
+            self._locks[service].release()
+
+    def shutdown(self, timeout=None):
+        """Para o monitor e todas as engines (saída do processo dos bots)."""
+        self._shutdown.set()
+        # Em paralelo: o tempo total de saída é o da engine mais lenta, não a soma
+        threads = [threading.Thread(target=self.stop, args=(service, timeout), daemon=True)
+                   for service in self._engines]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,197 @@
+"""
+Tracing leve dos comandos de chat, sem coletor externo.
+
+Cada comando recebido abre um trace (span raiz, com um trace id novo) no
+ChatPipeline; as etapas dentro dele (token da Blizzard, chamadas de perfil,
+leitura da planilha, cálculo de percentil, envio da resposta) abrem spans
+filhos. O span atual fica em uma ContextVar, então a hierarquia acompanha o
+código assíncrono (tasks herdam o contexto) e asyncio.to_thread sem nenhum
+parâmetro extra. Fora de um trace, span() não faz nada: tarefas de fundo
+(refresher, sincronização da planilha) não geram traces.
+
+Os traces ficam em um buffer circular por processo (os mais recentes); o
+endpoint /traces do app junta os buffers dos processos e mostra os mais lentos.
+"""
+import itertools
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+
+# Traces mantidos por processo e spans por trace (um trace não cresce sem limite)
+MAX_TRACES = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+MAX_SPANS_PER_TRACE = 200
+
+_current = ContextVar("tracing_span", default=None)
+_span_ids = itertools.count(1)
+_traces = deque(maxlen=MAX_TRACES)
+
+
+class Span:
+    """Uma etapa medida; `children` são os spans abertos enquanto ela estava ativa."""
+
+    __slots__ = ("name", "trace_id", "span_id", "root", "attributes", "children", "started_at", "_start",
+                 "duration", "error", "_spans")
+
+    def __init__(self, name, trace_id, root=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = next(_span_ids)
+        self.root = root or self
+        self.attributes = attributes or {}
+        self.children = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None  # em segundos; None enquanto o span está aberto
+        self.error = None
+        self._spans = 1 if root is None else 0  # contador de spans do trace (só no span raiz)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def child(self, name, **attributes):
+        """Cria (sem ativar) um span filho; retorna None se o trace já atingiu o limite de spans."""
+        raiz = self.root
+        if raiz._spans >= MAX_SPANS_PER_TRACE:
+            return None
+        raiz._spans += 1
+        span = Span(name, self.trace_id, raiz, attributes)
+        self.children.append(span)
+        return span
+
+    def finish(self, error=None):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+        if error is not None and self.error is None:
+            self.error = f"{type(error).__name__}: {error}"[:200]
+
+    def elapsed(self):
+        return self.duration if self.duration is not None else time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.elapsed() * 1000, 3),
+            "in_progress": self.duration is None,
+            "attributes": dict(self.attributes),
+            "error": self.error,
+            "children": [child.to_dict() for child in list(self.children)],
+        }
+
+
+class _ActiveSpan:
+    """Context manager que ativa um span (ContextVar) e o fecha na saída."""
+
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.span.finish(exc)
+        return False
+
+
+class _NoopSpan:
+    """Usado fora de um trace: todas as operações são ignoradas."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP = _NoopSpan()
+
+
+def current_span():
+    return _current.get()
+
+
+def current_trace_id():
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+def start_trace(name, **attributes):
+    """Abre um trace novo (span raiz, não ativado) e o registra no buffer."""
+    raiz = Span(name, f"{random.getrandbits(64):016x}", attributes=attributes)
+    _traces.append(raiz)
+    return raiz
+
+
+def start_span(name, **attributes):
+    """Abre um span filho do span atual, sem ativá-lo (ex: um job que será executado por outra task)."""
+    pai = _current.get()
+    if pai is None:
+        return None
+    return pai.child(name, **attributes)
+
+
+def activate(span):
+    """Torna o span o atual; retorna o token para deactivate()."""
+    return _current.set(span)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def span(name, **attributes):
+    """
+    Context manager de uma etapa dentro do trace atual:
+
+        with tracing.span("blizzard.get_character", realm=realm) as s:
+            ...
+            s.set(found=True)
+    """
+    filho = start_span(name, **attributes)
+    if filho is None:
+        return NOOP
+    return _ActiveSpan(filho)
+
+
+def trace(name, **attributes):
+    """Context manager que abre e ativa um trace novo (ex: um comando de chat)."""
+    return _ActiveSpan(start_trace(name, **attributes))
+
+
+def _trace_duration(raiz):
+    """Do início da raiz ao fim do último span (ex: a resposta enviada depois de um job da fila)."""
+    fim = raiz.started_at + raiz.elapsed()
+    pendentes = list(raiz.children)
+    while pendentes:
+        span = pendentes.pop()
+        fim = max(fim, span.started_at + span.elapsed())
+        pendentes.extend(span.children)
+    return fim - raiz.started_at
+
+
+def recent_traces():
+    """Traces do buffer deste processo, serializados (do mais antigo para o mais recente)."""
+    return [{"trace_id": raiz.trace_id, "total_ms": round(_trace_duration(raiz) * 1000, 3), **raiz.to_dict()}
+            for raiz in list(_traces)]
+
+
+def slowest(traces, limit=20, name=None):
+    """Os `limit` traces mais lentos, opcionalmente só os de um comando (nome do span raiz)."""
+    if name:
+        traces = [trace for trace in traces if trace["name"] == name]
+    return sorted(traces, key=lambda trace: trace["total_ms"], reverse=True)[:limit]
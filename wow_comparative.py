@@ -1,155 +1,1401 @@
-import os
-import requests
-import pandas as pd
-import re
-from unidecode import unidecode
-from dotenv import load_dotenv
-import gspread
-from google.oauth2.service_account import Credentials
-
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv(r"C:\Users\Vinicius\Projetos\bot_twitch\.env")
-
-def get_access_token(client_id, client_secret, region="us"):
-    """Autentica na API da Blizzard e retorna um token de acesso."""
-    auth_url = f"https://{region}.battle.net/oauth/token"
-    response = requests.post(auth_url, data={"grant_type": "client_credentials"}, auth=(client_id, client_secret))
-    response.raise_for_status()
-    return response.json().get("access_token")
-
-def clean_name(name):
-    """Remove acentos e formata o nome para slug."""
-    return re.sub(r"[^a-z0-9]+", "-", unidecode(name).lower()).strip("-")
-
-def get_character_data(region, realm_slug, character_name, token):
-    """Obtém informações gerais de um personagem."""
-    url = f"https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{character_name}"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"namespace": "profile-us", "locale": "en_US"}
-    response = requests.get(url, headers=headers, params=params)
-
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            "Character Name": data.get("name"),
-            "Realm": data.get("realm", {}).get("name"),
-            "Level": data.get("level"),
-            "Gender": data.get("gender", {}).get("name"),
-            "Faction": data.get("faction", {}).get("name"),
-            "Race": data.get("race", {}).get("name"),
-            "Class": data.get("character_class", {}).get("name"),
-            "Specialization": data.get("active_spec", {}).get("name"),
-            "Title": data.get("active_title", {}).get("name"),
-            "Achievement Points": data.get("achievement_points", 0),
-            "Average Item Level": data.get("average_item_level", 0),
-            "Equipped Item Level": data.get("equipped_item_level", 0),
-            "Last Login": data.get("last_login_timestamp"),
-            "Guild Name": data.get("guild", {}).get("name", "N/A"),
-            "Realm Slug": realm_slug
-        }
-    print(f"Erro ao obter dados do personagem {character_name}: {response.status_code}")
-    return None
-
-def get_character_statistics(region, realm_slug, character_name, token):
-    """Obtém estatísticas detalhadas do personagem."""
-    url = f"https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{character_name}/statistics"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"namespace": "profile-us", "locale": "en_US"}
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            "Health": data.get("health", 0),
-            "Power": data.get("power", 0),
-            "Power Type": data.get("power_type", {}).get("name", "N/A"),
-            "Strength": data.get("strength", {}).get("effective", 0),
-            "Agility": data.get("agility", {}).get("effective", 0),
-            "Intellect": data.get("intellect", {}).get("effective", 0),
-            "Stamina": data.get("stamina", {}).get("effective", 0),
-            "Armor": data.get("armor", {}).get("effective", 0),
-            "Versatility": data.get("versatility", 0),
-            "Melee Crit": data.get("melee_crit", {}).get("value", 0),
-            "Melee Haste": data.get("melee_haste", {}).get("value", 0),
-            "Mastery": data.get("mastery", {}).get("value", 0),
-            "Spell Power": data.get("spell_power", 0),
-            "Spell Crit": data.get("spell_crit", {}).get("value", 0),
-            "Dodge": data.get("dodge", {}).get("value", 0),
-            "Parry": data.get("parry", {}).get("value", 0),
-            "Block": data.get("block", {}).get("value", 0)
-        }
-    print(f"Erro ao obter estatísticas do personagem {character_name}: {response.status_code}")
-    return {}
-
-def calculate_percentile(df, player_name, realm_slug):
-    """Calcula o percentil do jogador em relação ao restante da base de dados com base nos Achievement Points."""
-    player_name = player_name.lower()
-    realm_slug = realm_slug.lower()
-
-    # Converte a coluna para números inteiros para evitar problemas
-    df["Achievement Points"] = pd.to_numeric(df["Achievement Points"], errors="coerce").fillna(0).astype(int)
-
-    player_row = df[(df["Character Name"].str.lower() == player_name) & 
-                    (df["Realm Slug"].str.lower() == realm_slug)]
-
-    if player_row.empty:
-        print(f"Player {player_name} no realm {realm_slug} não encontrado na base.")
-        return None
-
-    player_points = int(player_row["Achievement Points"].values[0])
-    percentile = (df["Achievement Points"] < player_points).mean() * 100
-    
-    print(f"{player_name} está no percentil {percentile:.2f} em relação aos Achievement Points da base.")
-    return percentile
-
-def get_google_sheets_df(spreadsheet_id, sheet_name, credentials_file):
-    """Lê a planilha do Google Sheets e retorna um DataFrame do pandas."""
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    creds = Credentials.from_service_account_file(credentials_file, scopes=scopes)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(spreadsheet_id).worksheet(sheet_name)
-    data = sheet.get_all_records()
-    
-    # Converte para DataFrame e substitui valores vazios por 0
-    return pd.DataFrame(data).fillna(0)
-
-def update_google_sheets(df, spreadsheet_id, sheet_name, credentials_file):
-    """
-    Atualiza ou adiciona registros únicos ao Google Sheets sem sobrescrever a planilha.
-    A comparação é feita com base em Character Name + Realm Slug.
-    """
-    import gspread
-    from google.oauth2.service_account import Credentials
-
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    creds = Credentials.from_service_account_file(credentials_file, scopes=scopes)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(spreadsheet_id).worksheet(sheet_name)
-
-    # Lê os dados existentes
-    existing_data = sheet.get_all_values()
-    if not existing_data:
-        # Se não houver nada, apenas escreve todos os dados com cabeçalho
-        sheet.append_rows([df.columns.tolist()] + df.fillna("").astype(str).values.tolist())
-        print(f"✅ Planilha estava vazia. {len(df)} registros adicionados.")
-        return
-
-    existing_df = pd.DataFrame(existing_data[1:], columns=existing_data[0])
-
-    # Geração de chaves de comparação
-    df["__key__"] = df["Character Name"].str.lower() + "_" + df["Realm Slug"].str.lower()
-    existing_df["__key__"] = existing_df["Character Name"].str.lower() + "_" + existing_df["Realm Slug"].str.lower()
-
-    # Verifica novos registros
-    novos_registros = df[~df["__key__"].isin(existing_df["__key__"])].drop(columns="__key__")
-
-    # Prepara e envia apenas os novos
-    if not novos_registros.empty:
-        safe_df = novos_registros.replace([pd.NA, None, float("inf"), float("-inf")], "").fillna("")
-        values = safe_df.astype(str).values.tolist()
-        sheet.append_rows(values, value_input_option="USER_ENTERED")
-        print(f"✅ {len(values)} novos registros adicionados à planilha.")
-    else:
-        print("ℹ️ Nenhum novo registro para adicionar.")
-
-
+import os
+import json
+import atexit
+import math
+import time
+import asyncio
+import threading
+import weakref
+import requests
+import aiohttp
+import re
+from collections import OrderedDict
+from unidecode import unidecode
+from dotenv import load_dotenv
+
+import metrics
+import tracing
+from state_store import open_state_store
+
+# pandas, gspread e google-auth são importados no primeiro uso: o bot sobe e
+# responde ao chat sem pagar o custo de importação dessas bibliotecas
+
+# Carregar variáveis de ambiente do arquivo .env
+load_dotenv(r"C:\Users\Vinicius\Projetos\bot_twitch\.env")
+
+# Cache de tokens por região: {região: {"client_id", "client_secret", "token", "expires_at"}}
+# (também salvo no state_store, sem o client_secret, para sobreviver a reinícios)
+_token_cache = {}
+# Um lock por região (criados sob demanda); o POST do OAuth de uma região não espera as outras
+_token_locks = {}
+_token_locks_guard = threading.Lock()
+# Renovar o token um pouco antes de expirar (os tokens valem 24 horas)
+TOKEN_REFRESH_MARGIN = 300
+
+# Regiões suportadas e o locale usado nas respostas da API de cada uma
+REGIONS = {"us": "en_US", "eu": "en_GB", "kr": "ko_KR", "tw": "zh_TW"}
+DEFAULT_REGION = "us"
+
+def _request_access_token(client_id, client_secret, region):
+    """Faz o POST de client credentials e retorna (token, expires_in)."""
+    auth_url = f"https://{region}.battle.net/oauth/token"
+    with metrics.timed("blizzard", "oauth") as chamada:
+        response = requests.post(auth_url, data={"grant_type": "client_credentials"}, auth=(client_id, client_secret))
+        chamada.check_status(response.status_code)
+    response.raise_for_status()
+    data = response.json()
+    return data.get("access_token"), data.get("expires_in", 86400)
+
+def _saved_tokens():
+    return open_state_store().namespace("blizzard_tokens", ttl=86400)
+
+def _region_lock(region):
+    """Lock do token de uma região: renovar o token de uma região não bloqueia as outras."""
+    lock = _token_locks.get(region)
+    if lock is None:
+        with _token_locks_guard:
+            lock = _token_locks.setdefault(region, threading.Lock())
+    return lock
+
+def _fetch_access_token(client_id, client_secret, region):
+    """Pede um token novo e o guarda no cache (chamar com o lock da região)."""
+    token, expires_in = _request_access_token(client_id, client_secret, region)
+    expires_at = time.time() + expires_in
+    _token_cache[region] = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "token": token,
+        "expires_at": expires_at,
+    }
+    _saved_tokens()[region] = {"client_id": client_id, "token": token, "expires_at": expires_at}
+    open_state_store().flush()
+    return token
+
+def get_access_token(client_id, client_secret, region="us", force_refresh=False):
+    """
+    Autentica na API da Blizzard e retorna um token de acesso.
+    O token fica em cache por região e só é renovado perto de expirar.
+    """
+    with _region_lock(region):
+        entry = _token_cache.get(region)
+        if entry is None:
+            salvo = _saved_tokens().get(region)
+            if salvo and salvo["client_id"] == client_id:
+                entry = _token_cache[region] = dict(salvo, client_secret=client_secret)
+        if (not force_refresh and entry and entry["client_id"] == client_id
+                and time.time() < entry["expires_at"] - TOKEN_REFRESH_MARGIN):
+            return entry["token"]
+        return _fetch_access_token(client_id, client_secret, region)
+
+def refresh_access_token(region, expired_token):
+    """
+    Renova o token da região após um 401 e retorna o novo token.
+    Se outra thread já renovou o token, apenas retorna o token atual.
+    """
+    with _region_lock(region):
+        entry = _token_cache.get(region)
+        if not entry:
+            return None
+        # Verificado com o lock: quem esperava a renovação de outra thread não renova de novo
+        if entry["token"] != expired_token:
+            return entry["token"]
+        return _fetch_access_token(entry["client_id"], entry["client_secret"], region)
+
+def _get_profile_api(region, url, token, params):
+    """GET autenticado na API de perfis, repetindo uma vez com token novo em caso de 401."""
+    with metrics.timed("blizzard", "profile") as chamada:
+        response = requests.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
+        chamada.check_status(response.status_code)
+    if response.status_code == 401:
+        new_token = refresh_access_token(region, token)
+        if new_token:
+            print("🔄 Token da Blizzard expirado, tentando novamente com um novo token")
+            with metrics.timed("blizzard", "profile") as chamada:
+                response = requests.get(url, headers={"Authorization": f"Bearer {new_token}"}, params=params)
+                chamada.check_status(response.status_code)
+    return response
+
+def clean_name(name):
+    """Remove acentos e formata o nome para slug."""
+    return re.sub(r"[^a-z0-9]+", "-", unidecode(name).lower()).strip("-")
+
+def character_slug(name):
+    """Nome do personagem para a URL da API: em minúsculas, mas com os acentos ("thrâll" não é "thrall")."""
+    return str(name).strip().lower()
+
+def parse_character_data(data, realm_slug):
+    """Extrai as informações gerais do JSON de perfil do personagem."""
+    return {
+        "Character Name": data.get("name"),
+        "Realm": data.get("realm", {}).get("name"),
+        "Level": data.get("level"),
+        "Gender": data.get("gender", {}).get("name"),
+        "Faction": data.get("faction", {}).get("name"),
+        "Race": data.get("race", {}).get("name"),
+        "Class": data.get("character_class", {}).get("name"),
+        "Specialization": data.get("active_spec", {}).get("name"),
+        "Title": data.get("active_title", {}).get("name"),
+        "Achievement Points": data.get("achievement_points", 0),
+        "Average Item Level": data.get("average_item_level", 0),
+        "Equipped Item Level": data.get("equipped_item_level", 0),
+        "Last Login": data.get("last_login_timestamp"),
+        "Guild Name": data.get("guild", {}).get("name", "N/A"),
+        "Realm Slug": realm_slug
+    }
+
+def parse_character_statistics(data):
+    """Extrai as estatísticas do JSON de statistics do personagem."""
+    return {
+        "Health": data.get("health", 0),
+        "Power": data.get("power", 0),
+        "Power Type": data.get("power_type", {}).get("name", "N/A"),
+        "Strength": data.get("strength", {}).get("effective", 0),
+        "Agility": data.get("agility", {}).get("effective", 0),
+        "Intellect": data.get("intellect", {}).get("effective", 0),
+        "Stamina": data.get("stamina", {}).get("effective", 0),
+        "Armor": data.get("armor", {}).get("effective", 0),
+        "Versatility": data.get("versatility", 0),
+        "Melee Crit": data.get("melee_crit", {}).get("value", 0),
+        "Melee Haste": data.get("melee_haste", {}).get("value", 0),
+        "Mastery": data.get("mastery", {}).get("value", 0),
+        "Spell Power": data.get("spell_power", 0),
+        "Spell Crit": data.get("spell_crit", {}).get("value", 0),
+        "Dodge": data.get("dodge", {}).get("value", 0),
+        "Parry": data.get("parry", {}).get("value", 0),
+        "Block": data.get("block", {}).get("value", 0)
+    }
+
+# Colunas da planilha Player_status, na ordem em que são gravadas
+PLAYER_COLUMNS = [
+    "Character Name", "Realm", "Level", "Gender", "Faction", "Race", "Class", "Specialization",
+    "Title", "Achievement Points", "Average Item Level", "Equipped Item Level", "Last Login",
+    "Guild Name", "Realm Slug", "Health", "Power", "Power Type", "Strength", "Agility",
+    "Intellect", "Stamina", "Armor", "Versatility", "Melee Crit", "Melee Haste", "Mastery",
+    "Spell Power", "Spell Crit", "Dodge", "Parry", "Block", "Last Updated", "Region",
+]
+NUMERIC_COLUMNS = [
+    "Level", "Achievement Points", "Average Item Level", "Equipped Item Level", "Last Login",
+    "Health", "Power", "Strength", "Agility", "Intellect", "Stamina", "Armor", "Versatility",
+    "Melee Crit", "Melee Haste", "Mastery", "Spell Power", "Spell Crit", "Dodge", "Parry", "Block",
+    "Last Updated",
+]
+
+# Métricas indexadas para percentis, com o rótulo usado nas respostas do chat
+PERCENTILE_METRICS = {
+    "Achievement Points": "Conquistas",
+    "Equipped Item Level": "iLvl",
+    "Health": "Vida",
+    "Stamina": "Vigor",
+    "Strength": "Força",
+    "Agility": "Agilidade",
+    "Intellect": "Intelecto",
+    "Versatility": "Versatilidade",
+    "Melee Crit": "Crítico",
+    "Melee Haste": "Aceleração",
+    "Mastery": "Maestria",
+}
+
+def player_key(character_name, realm_slug, region=None):
+    """
+    Chave única de um jogador: Character Name + Realm Slug normalizados, mais a
+    região fora dos EUA (linhas antigas, sem região, são todas da região us).
+    """
+    key = f"{clean_name(str(character_name))}_{clean_name(str(realm_slug))}"
+    region = str(region or DEFAULT_REGION).lower()
+    return key if region == DEFAULT_REGION else f"{key}_{region}"
+
+def record_key(record):
+    """Chave de um registro com as colunas da planilha."""
+    return player_key(record.get("Character Name", ""), record.get("Realm Slug", ""), record.get("Region"))
+
+def open_player_store(path=None):
+    """Abre o espelho local (SQLite) da planilha de jogadores."""
+    from player_store import PlayerStore
+    return PlayerStore(
+        path or os.getenv("PLAYER_STORE_PATH", "player_store.db"),
+        PLAYER_COLUMNS,
+        numeric_columns=NUMERIC_COLUMNS,
+        indexed_columns=["Achievement Points", "Last Updated"],
+    )
+
+def get_character_data(region, realm_slug, character_name, token):
+    """Obtém informações gerais de um personagem."""
+    url = f"https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{character_name}"
+    params = {"namespace": f"profile-{region}", "locale": REGIONS.get(region, "en_US")}
+    response = _get_profile_api(region, url, token, params)
+
+    if response.status_code == 200:
+        return parse_character_data(response.json(), realm_slug)
+    print(f"Erro ao obter dados do personagem {character_name}: {response.status_code}")
+    return None
+
+def get_character_statistics(region, realm_slug, character_name, token):
+    """Obtém estatísticas detalhadas do personagem."""
+    url = f"https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{character_name}/statistics"
+    params = {"namespace": f"profile-{region}", "locale": REGIONS.get(region, "en_US")}
+    response = _get_profile_api(region, url, token, params)
+    
+    if response.status_code == 200:
+        return parse_character_statistics(response.json())
+    print(f"Erro ao obter estatísticas do personagem {character_name}: {response.status_code}")
+    return {}
+
+class AsyncRateLimiter:
+    """
+    Limitador de taxa assíncrono (token bucket) com várias janelas simultâneas.
+    A Blizzard permite 100 requisições por segundo e 36.000 por hora.
+    """
+
+    def __init__(self, limits=((100, 1), (36000, 3600))):
+        # Cada janela: [capacidade, período, tokens disponíveis, último reabastecimento]
+        agora = time.monotonic()
+        self._buckets = [[float(capacity), float(period), float(capacity), agora] for capacity, period in limits]
+        self._lock = asyncio.Lock()
+
+    def _refill(self, agora):
+        for bucket in self._buckets:
+            capacity, period, tokens, last = bucket
+            bucket[2] = min(capacity, tokens + (agora - last) * capacity / period)
+            bucket[3] = agora
+
+    async def acquire(self):
+        """Aguarda até que todas as janelas tenham um token disponível e o consome."""
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self._refill(agora)
+                espera = max((1 - tokens) * period / capacity
+                             for capacity, period, tokens, _ in self._buckets)
+                if espera <= 0:
+                    for bucket in self._buckets:
+                        bucket[2] -= 1
+                    return
+                await asyncio.sleep(espera)
+
+_cache_blizzard = metrics.counter("blizzard_cache_total", "Consultas ao cache de respostas da Blizzard por resultado",
+                                  ("result",))
+
+
+class ResponseCache:
+    """
+    Cache das respostas da API de perfis, chaveado por região + caminho
+    (ou seja, região/realm/personagem/endpoint).
+
+    Dentro do TTL a resposta é servida sem ir à rede; depois disso a entrada é
+    revalidada com If-Modified-Since, e um 304 também conta como acerto.
+    O tamanho é limitado (LRU por número de entradas e por bytes), e o cache
+    pode ser persistido para sobreviver a reinícios: em um arquivo JSON
+    (`path`, gravado no close) ou em um namespace do state_store (`state`,
+    gravado nos snapshots periódicos).
+    """
+
+    def __init__(self, ttl=600, max_entries=2000, max_bytes=50 * 1024 * 1024, path=None, state=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.state = state
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "not_modified": 0, "misses": 0, "bytes_saved": 0, "seconds_saved": 0.0}
+        # Latência média de uma resposta completa, usada para estimar o tempo economizado
+        self._avg_fetch_seconds = None
+        if path:
+            self.load()
+        if state is not None:
+            self._load_state()
+
+    def get(self, key):
+        """Retorna a entrada (dict) ou None, marcando-a como usada recentemente."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def put(self, key, data, size, last_modified=None, stored_at=None):
+        """Guarda uma resposta; `stored_at` preserva a idade de uma entrada carregada do disco."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old["size"]
+            entry = self._entries[key] = {"data": data, "size": size, "last_modified": last_modified,
+                                          "stored_at": time.time() if stored_at is None else stored_at}
+            self._bytes += size
+            if self.state is not None:
+                self.state[key] = entry
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["size"]
+                if self.state is not None:
+                    self.state.pop(evicted_key)
+
+    def record_hit(self, entry, revalidated=False, seconds=0.0, key=None):
+        """Registra um acerto (fresco ou revalidado com 304) e a economia estimada."""
+        with self._lock:
+            if revalidated:
+                entry["stored_at"] = time.time()
+                if self.state is not None and key is not None:
+                    # Regrava a entrada: depois de um reinício o TTL conta a partir da revalidação
+                    self.state[key] = entry
+            self.stats["not_modified" if revalidated else "hits"] += 1
+            _cache_blizzard.labels("not_modified" if revalidated else "hit").inc()
+            self.stats["bytes_saved"] += entry["size"]
+            if self._avg_fetch_seconds is not None:
+                self.stats["seconds_saved"] += max(0.0, self._avg_fetch_seconds - seconds)
+
+    def record_miss(self, seconds):
+        with self._lock:
+            self.stats["misses"] += 1
+            _cache_blizzard.labels("miss").inc()
+            if self._avg_fetch_seconds is None:
+                self._avg_fetch_seconds = seconds
+            else:
+                self._avg_fetch_seconds = 0.9 * self._avg_fetch_seconds + 0.1 * seconds
+
+    def hit_ratio(self):
+        total = self.stats["hits"] + self.stats["not_modified"] + self.stats["misses"]
+        return (self.stats["hits"] + self.stats["not_modified"]) / total if total else 0.0
+
+    def save(self):
+        """Grava o cache em disco (escrita atômica)."""
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = [[key, entry] for key, entry in self._entries.items()]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Carrega o cache do disco, se o arquivo existir."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Não foi possível carregar o cache da Blizzard: {e}")
+            return
+        for key, entry in snapshot:
+            self.put(key, entry["data"], entry["size"], entry.get("last_modified"), entry["stored_at"])
+
+    def _load_state(self):
+        """Carrega as entradas salvas no state_store (das mais antigas para as mais recentes)."""
+        with self._lock:
+            for key, entry in sorted(self.state.items(), key=lambda item: item[1]["stored_at"]):
+                self._entries[key] = entry
+                self._bytes += entry["size"]
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["size"]
+                self.state.pop(evicted_key)
+
+# Endpoints de perfil buscados pelo cliente assíncrono
+PROFILE_ENDPOINTS = {
+    "profile": "",
+    "statistics": "/statistics",
+    "equipment": "/equipment",
+    "mythic_keystone": "/mythic-keystone-profile",
+}
+
+class BlizzardAPIError(Exception):
+    """Resposta de erro da API da Blizzard que não é um 404 (limite de taxa, erro do servidor etc.)."""
+
+    def __init__(self, path, status):
+        super().__init__(f"Erro {status} na API da Blizzard ({path})")
+        self.path = path
+        self.status = status
+
+class BlizzardClient:
+    """
+    Cliente assíncrono da API de perfis da Blizzard.
+
+    Usa uma única sessão aiohttp (conexões reaproveitadas), busca os endpoints
+    de um personagem em paralelo e respeita os limites de taxa da Blizzard.
+    """
+
+    def __init__(self, region="us", client_id=None, client_secret=None, locale=None, max_connections=20, cache=None):
+        self.region = region
+        self.client_id = client_id or os.getenv("BLIZZARD_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("BLIZZARD_CLIENT_SECRET")
+        self.locale = locale or REGIONS.get(region, "en_US")
+        self.max_connections = max_connections
+        # Os limites da Blizzard são contados por região, então cada cliente tem o seu
+        self.rate_limiter = AsyncRateLimiter()
+        # cache=False desativa o cache; None usa a configuração das variáveis de ambiente
+        if cache is None:
+            cache_file = os.getenv("BLIZZARD_CACHE_FILE")
+            if cache_file and region != DEFAULT_REGION:
+                raiz, extensao = os.path.splitext(cache_file)
+                cache_file = f"{raiz}_{region}{extensao}"
+            # Sem BLIZZARD_CACHE_FILE, o cache persiste no state_store
+            state = None if cache_file else open_state_store().namespace(f"blizzard_cache_{region}")
+            cache = ResponseCache(ttl=int(os.getenv("BLIZZARD_CACHE_TTL", "600")), path=cache_file, state=state)
+        self.cache = cache
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=15),
+            )
+        return self._session
+
+    async def _get_token(self, expired_token=None):
+        # O cache de tokens é síncrono; só bloqueia de fato quando precisa renovar
+        if expired_token:
+            return await asyncio.to_thread(refresh_access_token, self.region, expired_token)
+        return await asyncio.to_thread(get_access_token, self.client_id, self.client_secret, self.region)
+
+    async def get_json(self, path, namespace="profile", raise_errors=False):
+        """
+        GET autenticado em https://{região}.api.blizzard.com{path}.
+        Retorna o JSON decodificado ou None em caso de erro. Com raise_errors,
+        só um 404 retorna None; os demais erros levantam BlizzardAPIError.
+        """
+        with tracing.span("blizzard.get_json", path=path) as span:
+            return await self._get_json(path, namespace, span, raise_errors)
+
+    async def _get_json(self, path, namespace, span, raise_errors=False):
+        cache_key = f"{self.region}:{path}"
+        cached = self.cache.get(cache_key) if self.cache else None
+        if cached is not None and self.cache.is_fresh(cached):
+            self.cache.record_hit(cached)
+            span.set(cache="hit")
+            return cached["data"]
+
+        session = await self._get_session()
+        url = f"https://{self.region}.api.blizzard.com{path}"
+        params = {"namespace": f"{namespace}-{self.region}", "locale": self.locale}
+        with tracing.span("blizzard.token"):
+            token = await self._get_token()
+
+        for tentativa in range(2):
+            headers = {"Authorization": f"Bearer {token}"}
+            if cached is not None and cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+            with tracing.span("blizzard.rate_limit"):
+                await self.rate_limiter.acquire()
+            inicio = time.monotonic()
+            with metrics.timed("blizzard", namespace) as chamada:
+                async with session.get(url, params=params, headers=headers) as response:
+                    chamada.check_status(response.status)
+                    if response.status == 304 and cached is not None:
+                        self.cache.record_hit(cached, revalidated=True, seconds=time.monotonic() - inicio,
+                                             key=cache_key)
+                        span.set(cache="not_modified")
+                        return cached["data"]
+                    if response.status == 200:
+                        body = await response.read()
+                        data = json.loads(body)
+                        if self.cache:
+                            self.cache.record_miss(time.monotonic() - inicio)
+                            self.cache.put(cache_key, data, len(body), response.headers.get("Last-Modified"))
+                        span.set(cache="miss")
+                        return data
+            if response.status == 401 and tentativa == 0:
+                token = await self._get_token(expired_token=token)
+                if token:
+                    continue
+            print(f"Erro na API da Blizzard ({path}): {response.status}")
+            span.set(status=response.status)
+            if raise_errors and response.status != 404:
+                raise BlizzardAPIError(path, response.status)
+            return None
+        return None
+
+    async def fetch_character(self, realm_slug, character_name, endpoints=("profile", "statistics"),
+                              raise_errors=False):
+        """
+        Busca em paralelo os endpoints de um personagem e retorna {endpoint: JSON ou None}.
+        Com raise_errors, o primeiro erro que não for um 404 é levantado.
+        """
+        base = f"/profile/wow/character/{realm_slug}/{character_name}"
+        results = await asyncio.gather(
+            *(self.get_json(base + PROFILE_ENDPOINTS[endpoint], raise_errors=raise_errors) for endpoint in endpoints),
+            return_exceptions=True,
+        )
+        fetched = {}
+        for endpoint, result in zip(endpoints, results):
+            if isinstance(result, Exception):
+                if raise_errors:
+                    raise result
+                print(f"Erro ao buscar {endpoint} de {character_name}: {result}")
+                result = None
+            fetched[endpoint] = result
+        return fetched
+
+    async def get_character(self, realm_slug, character_name):
+        """
+        Equivalente assíncrono de get_character_data + get_character_statistics.
+        Retorna None se o perfil do personagem não existir (404); outras falhas
+        levantam BlizzardAPIError ou o erro de rede, para não serem confundidas
+        com um personagem inexistente.
+        """
+        with tracing.span("blizzard.get_character", realm=realm_slug, character=character_name,
+                          region=self.region) as span:
+            fetched = await self.fetch_character(realm_slug, character_name, raise_errors=True)
+            span.set(found=bool(fetched.get("profile")))
+        if not fetched.get("profile"):
+            return None
+        character_data = parse_character_data(fetched["profile"], realm_slug)
+        character_data.update(parse_character_statistics(fetched.get("statistics") or {}))
+        # Momento da busca (epoch em segundos), usado para reatualizar as linhas mais antigas
+        character_data["Last Updated"] = int(time.time())
+        character_data["Region"] = self.region
+        return character_data
+
+    async def get_guild_roster(self, realm_slug, guild_slug):
+        """Retorna a lista de (realm_slug, nome) dos membros de uma guilda."""
+        data = await self.get_json(f"/data/wow/guild/{clean_name(realm_slug)}/{clean_name(guild_slug)}/roster")
+        if not data:
+            return []
+        membros = []
+        for member in data.get("members", []):
+            character = member.get("character", {})
+            if character.get("name"):
+                membros.append((character.get("realm", {}).get("slug", realm_slug), character["name"].lower()))
+        return membros
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self.cache:
+            self.cache.save()
+
+# Um cliente por região: token, pool de conexões e limitador de taxa independentes,
+# para que comparações de regiões diferentes não disputem o mesmo cliente
+_blizzard_clients = {}
+
+def get_blizzard_client(region=DEFAULT_REGION):
+    """Retorna o BlizzardClient da região, criando-o no primeiro uso."""
+    region = region.lower()
+    if region not in REGIONS:
+        raise ValueError(f"Região inválida: {region} (use {', '.join(REGIONS)})")
+    client = _blizzard_clients.get(region)
+    if client is None:
+        client = _blizzard_clients[region] = BlizzardClient(region)
+    return client
+
+async def close_blizzard_clients():
+    """Fecha as sessões e salva o cache de todos os clientes criados."""
+    clients = list(_blizzard_clients.values())
+    _blizzard_clients.clear()
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+# Índice de realms por região, salvo em disco e recarregado uma vez por dia
+REALM_INDEX_MAX_AGE = 86400
+_realm_indexes = {}
+# Locks por event loop e região: um asyncio.Lock só serve ao loop em que foi usado, e com
+# BOT_ISOLATION=thread o supervisor reinicia a Twitch em um loop novo
+_realm_index_locks = weakref.WeakKeyDictionary()
+
+def _realm_index_path(region):
+    return os.path.join(os.getenv("REALM_INDEX_DIR", "."), f"realm_index_{region}.json")
+
+async def get_realm_index(region=DEFAULT_REGION):
+    """
+    Retorna o RealmIndex da região: da memória, do disco ou da API
+    (/data/wow/realm/index). Retorna None se a lista não puder ser obtida.
+    """
+    from realm_index import RealmIndex
+
+    index = _realm_indexes.get(region)
+    if index is not None and not index.is_stale(REALM_INDEX_MAX_AGE):
+        return index
+    locks = _realm_index_locks.setdefault(asyncio.get_running_loop(), {})
+    async with locks.setdefault(region, asyncio.Lock()):
+        index = _realm_indexes.get(region)
+        if index is None:
+            index = await asyncio.to_thread(RealmIndex.load, _realm_index_path(region))
+        if index is None or index.is_stale(REALM_INDEX_MAX_AGE):
+            data = await get_blizzard_client(region).get_json("/data/wow/realm/index", namespace="dynamic")
+            if data and data.get("realms"):
+                index = RealmIndex.from_api(data)
+                await asyncio.to_thread(index.save, _realm_index_path(region))
+                print(f"🗺️ Índice de realms ({region}) atualizado: {len(index)} realms")
+            elif index is not None:
+                # Mantém a lista antiga e tenta de novo em 10 minutos
+                index.fetched_at = time.time() - REALM_INDEX_MAX_AGE + 600
+        if index is not None:
+            _realm_indexes[region] = index
+        return index
+
+async def validate_realm(region, realm):
+    """
+    Valida o realm digitado contra o índice local, sem chamar a API de perfis.
+
+    Returns:
+        Tuple (slug, sugestões). O slug vem corrigido quando há uma única
+        correspondência, e é None quando o realm não existe. Sem índice
+        disponível, o texto é aceito como está.
+    """
+    try:
+        index = await get_realm_index(region)
+    except Exception as e:
+        print(f"⚠️ Erro ao carregar o índice de realms ({region}): {e}")
+        index = None
+    if index is None:
+        return clean_name(realm), []
+    return index.resolve(realm)
+
+def open_percentile_index(store):
+    """Constrói o índice de percentis em memória a partir do espelho local."""
+    from percentile_index import PercentileIndex
+    return PercentileIndex.from_rows(store.rows(), PERCENTILE_METRICS)
+
+def format_percentiles(percentiles, metrics=None):
+    """Formata {métrica: percentil} como "Conquistas 85%, iLvl 72%, ..."."""
+    partes = []
+    for metric, label in PERCENTILE_METRICS.items():
+        if metric in percentiles and (metrics is None or metric in metrics):
+            partes.append(f"{label} {percentiles[metric]:.0f}%")
+    return ", ".join(partes)
+
+def resolve_metric(texto):
+    """Encontra a métrica pelo nome em inglês ou pelo rótulo (ex: "conquistas", "ilvl"); None se não existir."""
+    slug = clean_name(texto)
+    for metric, label in PERCENTILE_METRICS.items():
+        if slug in (clean_name(metric), clean_name(label)):
+            return metric
+    return None
+
+def parse_leaderboard_args(argumentos, groups):
+    """
+    Interpreta os argumentos do !top: [métrica] [n] [classe] [especialização], em qualquer ordem.
+
+    Args:
+        argumentos: Palavras digitadas depois do comando
+        groups: {classe: {especializações}} presentes na base (PercentileIndex.groups)
+
+    Returns:
+        Tuple (métrica, n, classe, especialização)
+
+    Raises:
+        ValueError: Com a mensagem para o chat quando o filtro não existe na base
+    """
+    metric, n, resto = "Achievement Points", 5, []
+    for argumento in argumentos:
+        if argumento.isdigit():
+            n = max(1, min(10, int(argumento)))
+        elif resolve_metric(argumento) and not resto:
+            metric = resolve_metric(argumento)
+        else:
+            resto.append(argumento)
+    if not resto:
+        return metric, n, None, None
+
+    filtro = clean_name(" ".join(resto))
+    for classe, especializacoes in groups.items():
+        if filtro == clean_name(classe):
+            return metric, n, classe, None
+        for spec in especializacoes:
+            if filtro in (f"{clean_name(spec)}-{clean_name(classe)}", f"{clean_name(classe)}-{clean_name(spec)}"):
+                return metric, n, classe, spec
+    # Só a especialização: vale se pertencer a uma única classe (ex: "Frost" é de Mage e de Death Knight)
+    candidatos = [(classe, spec) for classe, especializacoes in groups.items()
+                  for spec in especializacoes if clean_name(spec) == filtro]
+    if len(candidatos) == 1:
+        return (metric, n) + candidatos[0]
+    if candidatos:
+        opcoes = ", ".join(f"{spec} {classe}" for classe, spec in candidatos)
+        raise ValueError(f"Especialização ambígua, informe a classe: {opcoes}")
+    raise ValueError(f"Classe ou especialização '{' '.join(resto)}' não encontrada na base")
+
+def format_leaderboard(top, metric):
+    """Formata o resultado de PercentileIndex.top como "1. Nome (Realm) 12345 | 2. ..."."""
+    return " | ".join(f"{posicao}. {nome} ({realm}) {_format_metric_value(valor)}"
+                      for posicao, (_, nome, realm, valor) in enumerate(top, 1))
+
+def _format_metric_value(valor):
+    """Valor por extenso: inteiros sem casas (Vida 1234567, não 1.23457e+06), o resto com duas casas."""
+    return f"{valor:.0f}" if float(valor).is_integer() else f"{valor:.2f}"
+
+def format_rank(rank):
+    """Formata o resultado de PercentileIndex.rank como "#12 de 3400 | #3 de 250 Mage | ..."."""
+    partes = []
+    for grupo in ("geral", "classe", "spec"):
+        if grupo in rank:
+            posicao, total, rotulo = rank[grupo]
+            partes.append(f"#{posicao} de {total}" + (f" entre {rotulo}" if rotulo else " no geral"))
+    return " | ".join(partes)
+
+def calculate_percentile(df, player_name, realm_slug):
+    """Calcula o percentil do jogador em relação ao restante da base de dados com base nos Achievement Points."""
+    player_name = player_name.lower()
+    realm_slug = realm_slug.lower()
+
+    import pandas as pd
+
+    # Converte a coluna para números inteiros para evitar problemas
+    df["Achievement Points"] = pd.to_numeric(df["Achievement Points"], errors="coerce").fillna(0).astype(int)
+
+    player_row = df[(df["Character Name"].str.lower() == player_name) & 
+                    (df["Realm Slug"].str.lower() == realm_slug)]
+
+    if player_row.empty:
+        print(f"Player {player_name} no realm {realm_slug} não encontrado na base.")
+        return None
+
+    player_points = int(player_row["Achievement Points"].values[0])
+    percentile = (df["Achievement Points"] < player_points).mean() * 100
+    
+    print(f"{player_name} está no percentil {percentile:.2f} em relação aos Achievement Points da base.")
+    return percentile
+
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+
+def _is_auth_error(error):
+    """Erros que indicam credenciais/token inválidos e pedem uma nova conexão."""
+    import gspread
+    import google.auth.exceptions
+
+    if isinstance(error, google.auth.exceptions.RefreshError):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, gspread.exceptions.APIError) and getattr(response, "status_code", None) in (401, 403)
+
+class SheetsClientHolder:
+    """
+    Cliente do Google Sheets compartilhado pelo processo.
+
+    As credenciais da service account são lidas do disco uma única vez e o
+    cliente autorizado é reaproveitado (o google-auth renova o token de acesso
+    só quando ele expira). Os worksheets também ficam em cache, evitando
+    open_by_key/worksheet a cada chamada. Em erros de autenticação a conexão é
+    descartada e a operação é repetida uma vez com um cliente novo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._worksheets = {}
+
+    def _client(self, credentials_file):
+        client = self._clients.get(credentials_file)
+        if client is None:
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            creds = Credentials.from_service_account_file(credentials_file, scopes=SHEETS_SCOPES)
+            client = gspread.authorize(creds)
+            self._clients[credentials_file] = client
+        return client
+
+    def worksheet(self, spreadsheet_id, sheet_name, credentials_file):
+        """Retorna o worksheet em cache (abrindo-o na primeira vez)."""
+        cache_key = (credentials_file, spreadsheet_id, sheet_name)
+        with self._lock:
+            sheet = self._worksheets.get(cache_key)
+            if sheet is None:
+                sheet = self._client(credentials_file).open_by_key(spreadsheet_id).worksheet(sheet_name)
+                self._worksheets[cache_key] = sheet
+            return sheet
+
+    def reset(self, credentials_file=None):
+        """Descarta clientes e worksheets em cache (todos, ou os de um arquivo de credenciais)."""
+        with self._lock:
+            for key in [k for k in self._clients if credentials_file in (None, k)]:
+                del self._clients[key]
+            for key in [k for k in self._worksheets if credentials_file in (None, k[0])]:
+                del self._worksheets[key]
+
+    def run(self, spreadsheet_id, sheet_name, credentials_file, operation, label="run"):
+        """
+        Executa operation(sheet), reconectando e repetindo uma vez em caso de erro de autenticação.
+        `label` identifica a operação nas métricas de latência.
+        """
+        for tentativa in range(2):
+            sheet = self.worksheet(spreadsheet_id, sheet_name, credentials_file)
+            try:
+                with metrics.timed("sheets", label):
+                    return operation(sheet)
+            except Exception as e:
+                if tentativa == 0 and _is_auth_error(e):
+                    print(f"🔄 Erro de autenticação no Google Sheets, reconectando: {e}")
+                    self.reset(credentials_file)
+                    continue
+                raise
+
+sheets_client = SheetsClientHolder()
+
+def get_google_sheets_df(spreadsheet_id, sheet_name, credentials_file):
+    """Lê a planilha do Google Sheets e retorna um DataFrame do pandas."""
+    data = sheets_client.run(spreadsheet_id, sheet_name, credentials_file, lambda sheet: sheet.get_all_records(),
+                             label="read")
+    
+    # Converte para DataFrame e substitui valores vazios por 0
+    import pandas as pd
+
+    return pd.DataFrame(data).fillna(0)
+
+class SheetIndex:
+    """
+    Índice chave -> número da linha na planilha (Character Name + Realm Slug,
+    normalizados com clean_name). É carregado uma vez por processo e mantido a
+    cada escrita, para que update_google_sheets não precise reler a planilha.
+    """
+
+    def __init__(self, header, rows):
+        self.header = header
+        self.rows = rows
+
+    @classmethod
+    def load(cls, sheet):
+        """Lê o cabeçalho e apenas as colunas da chave (duas chamadas leves à API)."""
+        header = sheet.row_values(1)
+        if "Character Name" not in header or "Realm Slug" not in header:
+            return cls(header, {})
+        key_columns = [column for column in ("Character Name", "Realm Slug", "Region") if column in header]
+        ranges = []
+        for column in key_columns:
+            letter = _column_letter(header.index(column) + 1)
+            ranges.append(f"{letter}2:{letter}")
+        columns = sheet.batch_get(ranges)
+        names, realms = columns[0], columns[1]
+        regions = columns[2] if len(columns) > 2 else []
+
+        def cell(values, offset):
+            return values[offset][0] if offset < len(values) and values[offset] else ""
+
+        rows = {}
+        for offset in range(max(len(names), len(realms))):
+            name = cell(names, offset)
+            if name:
+                rows[player_key(name, cell(realms, offset), cell(regions, offset))] = offset + 2
+        return cls(header, rows)
+
+def _column_letter(col):
+    """Converte o número da coluna (1 = A) para a letra usada em ranges A1."""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _cell_value(value):
+    """Valor seguro para a planilha: None, NaN e infinitos viram célula vazia."""
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return ""
+    return str(value)
+
+def _first_row_of_range(a1_range):
+    """Extrai a primeira linha de um range como 'Player_status!A10:AF12'."""
+    match = re.search(r"![A-Z]+(\d+)", a1_range or "")
+    return int(match.group(1)) if match else None
+
+_sheet_indexes = {}
+_sheet_index_lock = threading.Lock()
+
+def update_google_sheets(df, spreadsheet_id, sheet_name, credentials_file):
+    """
+    Atualiza ou adiciona registros únicos ao Google Sheets sem sobrescrever a planilha.
+    A comparação é feita com base em Character Name + Realm Slug.
+
+    Registros novos são adicionados com um único append_rows; registros que já
+    existem são atualizados no lugar com um único batch_update, usando o índice
+    de linhas mantido em memória (a planilha não é relida a cada chamada).
+
+    Args:
+        df: DataFrame do pandas ou lista de dicts com as colunas da planilha
+    """
+    records = df.to_dict("records") if hasattr(df, "to_dict") else list(df)
+    if not records:
+        return
+
+    sheets_client.run(spreadsheet_id, sheet_name, credentials_file,
+                      lambda sheet: _upsert_rows(sheet, (spreadsheet_id, sheet_name), records), label="upsert")
+
+def _extend_header(sheet, index, records):
+    """Adiciona ao cabeçalho as colunas novas presentes nos registros (ex: Last Updated)."""
+    missing = [column for column in PLAYER_COLUMNS
+               if column not in index.header and any(column in r for r in records)]
+    if not missing:
+        return
+    header = index.header + missing
+    if len(header) > sheet.col_count:
+        sheet.add_cols(len(header) - sheet.col_count)
+    sheet.batch_update([{"range": f"A1:{_column_letter(len(header))}1", "values": [header]}],
+                       value_input_option="USER_ENTERED")
+    index.header = header
+    print(f"✅ Colunas adicionadas ao cabeçalho da planilha: {', '.join(missing)}")
+
+def _upsert_rows(sheet, cache_key, records):
+    """Aplica o upsert indexado de update_google_sheets em um worksheet já aberto."""
+    with _sheet_index_lock:
+        index = _sheet_indexes.get(cache_key)
+        if index is None:
+            index = SheetIndex.load(sheet)
+            _sheet_indexes[cache_key] = index
+
+        try:
+            if not index.header:
+                # Se não houver nada, escreve o cabeçalho junto com os dados
+                header = [column for column in PLAYER_COLUMNS if any(column in r for r in records)]
+                sheet.append_rows([header], value_input_option="USER_ENTERED")
+                index.header = header
+                print("✅ Planilha estava vazia. Cabeçalho criado.")
+            else:
+                _extend_header(sheet, index, records)
+
+            last_col = _column_letter(len(index.header))
+            new_positions, new_values, updates = {}, [], []
+            for record in records:
+                key = record_key(record)
+                values = [_cell_value(record.get(column)) for column in index.header]
+                row = index.rows.get(key)
+                if row is None:
+                    if key in new_positions:
+                        new_values[new_positions[key]] = values
+                    else:
+                        new_positions[key] = len(new_values)
+                        new_values.append(values)
+                else:
+                    updates.append({"range": f"A{row}:{last_col}{row}", "values": [values]})
+
+            if updates:
+                sheet.batch_update(updates, value_input_option="USER_ENTERED")
+                print(f"✅ {len(updates)} registros atualizados na planilha.")
+
+            if new_values:
+                response = sheet.append_rows(new_values, value_input_option="USER_ENTERED")
+                first_row = _first_row_of_range(response.get("updates", {}).get("updatedRange"))
+                if first_row is None:
+                    # Sem a linha exata, o índice é recarregado na próxima chamada
+                    _sheet_indexes.pop(cache_key, None)
+                else:
+                    for key, offset in new_positions.items():
+                        index.rows[key] = first_row + offset
+                print(f"✅ {len(new_values)} novos registros adicionados à planilha.")
+        except Exception:
+            # O índice pode ter ficado inconsistente com a planilha
+            _sheet_indexes.pop(cache_key, None)
+            raise
+
+
+def _is_rate_limit_error(error):
+    """429 (cota de escrita excedida) ou erros temporários 5xx da API do Sheets."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    import gspread
+
+    return isinstance(error, gspread.exceptions.APIError) and (status == 429 or (status or 0) >= 500)
+
+class SheetsSync:
+    """
+    Sincroniza o espelho local com o Google Sheets em uma thread separada.
+
+    Escrita write-behind: cada !compare apenas grava no espelho local (a linha
+    fica pendente no SQLite) e chama notify(). As linhas pendentes são enviadas
+    juntas em um único update_google_sheets quando `flush_size` escritas se
+    acumulam ou quando `flush_interval` segundos se passam desde a primeira
+    escrita pendente. Em caso de 429 o envio é repetido com backoff
+    exponencial, e stop() (também registrado no atexit) faz um último envio.
+    A planilha inteira é importada de tempos em tempos para trazer linhas
+    adicionadas por outras fontes.
+    """
+
+    def __init__(self, store, spreadsheet_id, sheet_name, credentials_file,
+                 flush_size=25, flush_interval=10, pull_interval_seconds=1800, max_backoff=300, on_pull=None):
+        self.store = store
+        # Chamado com os (key, record) importados, para manter índices em memória atualizados
+        self.on_pull = on_pull
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.credentials_file = credentials_file
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pull_interval = pull_interval_seconds
+        self.max_backoff = max_backoff
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = 0
+        self._first_pending = None
+        self._backoff = 0
+        self._retry_at = 0
+        self._last_pull = 0
+        self.stats = {"flushes": 0, "rows_flushed": 0, "rate_limited": 0}
+
+    def pull(self):
+        """Importa a planilha para o espelho local, sem sobrescrever alterações pendentes."""
+        # Leitura direta (sem DataFrame): o espelho local já normaliza células vazias
+        records = sheets_client.run(self.spreadsheet_id, self.sheet_name, self.credentials_file,
+                                    lambda sheet: sheet.get_all_records(), label="read")
+        items = [(record_key(r), r) for r in records if r.get("Character Name")]
+        self.store.upsert_many(items, dirty=False, overwrite_dirty=False)
+        if self.on_pull:
+            self.on_pull(self.store.rows())
+        self._last_pull = time.time()
+        print(f"🔄 Espelho local atualizado a partir da planilha: {len(items)} jogadores")
+
+    def flush(self):
+        """Envia para a planilha, em lote, todas as linhas alteradas localmente."""
+        with self._flush_lock:
+            with self._lock:
+                self._pending = 0
+                self._first_pending = None
+            pending = self.store.dirty_rows()
+            if not pending:
+                return 0
+            update_google_sheets([record for _, record, _ in pending], self.spreadsheet_id, self.sheet_name,
+                                 self.credentials_file)
+            self.store.mark_clean((key, version) for key, _, version in pending)
+            self.stats["flushes"] += 1
+            self.stats["rows_flushed"] += len(pending)
+            return len(pending)
+
+    def notify(self):
+        """Registra uma escrita pendente; dispara o envio se o lote atingiu `flush_size`."""
+        with self._lock:
+            self._pending += 1
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+            if self._pending >= self.flush_size:
+                self._wakeup.set()
+
+    def _seconds_until_next_action(self):
+        agora = time.monotonic()
+        with self._lock:
+            if self._retry_at > agora:
+                return self._retry_at - agora
+            if self._pending >= self.flush_size:
+                return 0
+            if self._first_pending is not None:
+                return max(0, self._first_pending + self.flush_interval - agora)
+        return max(0, self.pull_interval - (time.time() - self._last_pull))
+
+    def _flush_due(self):
+        with self._lock:
+            if time.monotonic() < self._retry_at:
+                return False
+            if self._pending >= self.flush_size:
+                return True
+            return self._first_pending is not None and time.monotonic() - self._first_pending >= self.flush_interval
+
+    def _sync_loop(self):
+        # Linhas que ficaram pendentes antes de um reinício são enviadas no primeiro ciclo
+        if self.store.dirty_rows(limit=1):
+            with self._lock:
+                self._first_pending = time.monotonic() - self.flush_interval
+        while self.running:
+            try:
+                if self._flush_due():
+                    enviados = self.flush()
+                    if enviados:
+                        print(f"✅ Lote de {enviados} jogadores enviado para a planilha")
+                    self._backoff = 0
+                if time.time() - self._last_pull >= self.pull_interval:
+                    self.pull()
+            except Exception as e:
+                if _is_rate_limit_error(e):
+                    self.stats["rate_limited"] += 1
+                self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else 2)
+                with self._lock:
+                    self._retry_at = time.monotonic() + self._backoff
+                    if self._first_pending is None:
+                        self._first_pending = time.monotonic()
+                print(f"⚠️ Erro ao sincronizar com o Google Sheets (nova tentativa em {self._backoff}s): {e}")
+            self._wakeup.wait(self._seconds_until_next_action())
+            self._wakeup.clear()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._sync_loop, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Para a thread e envia as linhas ainda pendentes."""
+        if not self.running:
+            return
+        self.running = False
+        # Sem isso, cada SheetsSync parado (ex: um MeuBot recriado a cada reinício da Twitch)
+        # continuaria registrado no atexit, mantendo a instância e o seu store vivos
+        atexit.unregister(self.stop)
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+            self.thread = None
+        for tentativa in range(3):
+            try:
+                self.flush()
+                break
+            except Exception as e:
+                print(f"⚠️ Erro no envio final para a planilha: {e}")
+                if not _is_rate_limit_error(e):
+                    break
+                time.sleep(2 ** (tentativa + 1))
+
+
+class StaleRefresher:
+    """
+    Reatualiza em segundo plano os jogadores com o "Last Updated" mais antigo.
+
+    As chamadas à API são espaçadas de forma uniforme para consumir no máximo
+    `calls_per_hour` da cota horária da Blizzard (o restante fica para o
+    !compare), e o refresher pausa enquanto `is_busy()` indicar tráfego alto
+    vindo do chat. Roda como uma task no event loop do bot.
+
+    Args:
+        get_client: Função região -> BlizzardClient (ex: get_blizzard_client), para
+            compartilhar o limitador de taxa com o !compare
+        store: PlayerStore com a base de jogadores
+        on_refresh: Função chamada com (key, registro) para gravar o resultado
+        calls_per_hour: Orçamento de requisições por hora para o refresher
+        min_age: Idade mínima (segundos) para uma linha ser considerada desatualizada
+        is_busy: Função sem argumentos; enquanto retornar True, o refresher pausa
+    """
+
+    # Cada personagem custa uma chamada de perfil e uma de estatísticas
+    CALLS_PER_CHARACTER = 2
+
+    def __init__(self, get_client, store, on_refresh, calls_per_hour=3600, min_age=86400, is_busy=None,
+                 batch_size=50, busy_wait=5, idle_wait=300):
+        self.get_client = get_client
+        self.store = store
+        self.on_refresh = on_refresh
+        self.interval = self.CALLS_PER_CHARACTER * 3600 / calls_per_hour
+        self.min_age = min_age
+        self.is_busy = is_busy
+        self.batch_size = batch_size
+        self.busy_wait = busy_wait
+        self.idle_wait = idle_wait
+        self._batch = []
+        self._not_found = set()
+        self._task = None
+        self.stats = {"refreshed": 0, "not_found": 0, "errors": 0, "paused": 0}
+
+    def start(self):
+        """Cria a task no event loop atual."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"🔁 Refresher de jogadores iniciado (1 personagem a cada {self.interval:.1f}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _load_batch(self):
+        corte = time.time() - self.min_age
+        linhas = self.store.oldest("Last Updated", self.batch_size + len(self._not_found))
+        return [(key, record) for key, record in linhas
+                if key not in self._not_found and (record.get("Last Updated") or 0) < corte][:self.batch_size]
+
+    async def _next_stale(self):
+        if not self._batch:
+            # Ordem decrescente de idade; pop() retira o mais antigo do final da lista
+            self._batch = (await asyncio.to_thread(self._load_batch))[::-1]
+        return self._batch.pop() if self._batch else None
+
+    async def refresh_one(self, key, record):
+        """Busca um jogador novamente e grava o resultado; retorna True se foi atualizado."""
+        client = self.get_client(record.get("Region") or DEFAULT_REGION)
+        realm_slug = record.get("Realm Slug") or ""
+        # Erros que não são 404 (BlizzardAPIError, rede) sobem para _run e o jogador volta em outro lote
+        character_data = await client.get_character(clean_name(str(realm_slug)),
+                                                    character_slug(record.get("Character Name") or ""))
+        if character_data is None:
+            # 404: personagem renomeado, transferido ou apagado; não tenta de novo neste processo
+            self._not_found.add(key)
+            self.stats["not_found"] += 1
+            return False
+        await asyncio.to_thread(self.on_refresh, key, character_data)
+        self.stats["refreshed"] += 1
+        return True
+
+    async def _run(self):
+        while True:
+            if self.is_busy is not None and self.is_busy():
+                self.stats["paused"] += 1
+                await asyncio.sleep(self.busy_wait)
+                continue
+            try:
+                candidato = await self._next_stale()
+                if candidato is None:
+                    await asyncio.sleep(self.idle_wait)
+                    continue
+                inicio = time.monotonic()
+                await self.refresh_one(*candidato)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Erro no refresher de jogadores: {e}")
+                inicio = time.monotonic()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - inicio)))
+
+def read_character_list(path):
+    """
+    Lê um arquivo com um personagem por linha, no formato "realm,personagem"
+    (também aceita "realm/personagem" ou separado por espaço).
+    Linhas vazias e comentários (#) são ignorados.
+    """
+    personagens = []
+    with open(path, encoding="utf-8") as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.split("#", 1)[0].strip()
+            if not linha:
+                continue
+            partes = re.split(r"[,;/\s]+", linha, maxsplit=1)
+            if len(partes) != 2:
+                print(f"⚠️ Linha {numero} ignorada (esperado realm,personagem): {linha}")
+                continue
+            personagens.append((partes[0].strip().lower(), partes[1].strip().lower()))
+    return personagens
+
+def _load_import_progress(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("done", {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Não foi possível ler o progresso da importação: {e}")
+        return {}
+
+def _save_import_progress(path, done):
+    """Grava o progresso (escrita atômica): chave -> registro, ou None se não encontrado."""
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"done": done}, f)
+    os.replace(tmp_path, path)
+
+async def bulk_fetch_characters(client, characters, progress_file=None, concurrency=20, checkpoint_every=50):
+    """
+    Busca vários personagens em paralelo, respeitando o limitador de taxa do cliente.
+
+    O progresso (inclusive os dados já baixados) é salvo em `progress_file` a
+    cada `checkpoint_every` personagens; uma execução interrompida continua de
+    onde parou sem repetir as chamadas à API.
+
+    Só um 404 é registrado como não encontrado; as demais falhas (limite de
+    taxa, erros do servidor, rede) ficam pendentes para a próxima execução.
+
+    Returns:
+        dict: chave do jogador -> registro, ou None se o personagem não foi encontrado
+    """
+    done = _load_import_progress(progress_file)
+    pendentes = []
+    vistos = set(done)
+    for realm_slug, character_name in characters:
+        key = player_key(character_name, realm_slug, client.region)
+        if key not in vistos:
+            vistos.add(key)
+            pendentes.append((key, realm_slug, character_name))
+    if done:
+        print(f"↩️ Retomando importação: {len(done)} já processados, {len(pendentes)} restantes")
+
+    semaforo = asyncio.Semaphore(concurrency)
+    inicio = time.monotonic()
+    desde_checkpoint = 0
+
+    async def buscar(key, realm_slug, character_name):
+        nonlocal desde_checkpoint
+        async with semaforo:
+            try:
+                done[key] = await client.get_character(clean_name(realm_slug), character_slug(character_name))
+            except Exception as e:
+                # Erros da API (exceto 404) e de rede ficam fora do progresso para serem repetidos na próxima execução
+                print(f"❌ Erro ao buscar {character_name} ({realm_slug}): {e}")
+                return
+        desde_checkpoint += 1
+        if desde_checkpoint >= checkpoint_every:
+            desde_checkpoint = 0
+            _save_import_progress(progress_file, done)
+            decorrido = time.monotonic() - inicio
+            print(f"⏳ {len(done)}/{len(vistos)} personagens ({len(done) / max(decorrido, 1e-9):.1f}/s)")
+
+    try:
+        await asyncio.gather(*(buscar(*item) for item in pendentes))
+    finally:
+        _save_import_progress(progress_file, done)
+    return done
+
+def bulk_import(characters, region="us", progress_file="bulk_import_progress.json", concurrency=20,
+                store=None, spreadsheet_id=None, sheet_name="Player_status", credentials_file=None):
+    """
+    Importa (ou atualiza) uma lista de (realm_slug, personagem) de uma vez.
+
+    As buscas são concorrentes; no final todos os registros são gravados em
+    uma única transação no espelho local e, se `spreadsheet_id` for informado,
+    enviados em um único lote para a planilha. O arquivo de progresso é
+    removido quando a importação termina com sucesso.
+    """
+    async def buscar_todos():
+        client = BlizzardClient(region)
+        try:
+            return await bulk_fetch_characters(client, characters, progress_file, concurrency)
+        finally:
+            await client.close()
+
+    done = asyncio.run(buscar_todos())
+    encontrados = [(key, record) for key, record in done.items() if record]
+    print(f"📥 {len(encontrados)} personagens encontrados, {len(done) - len(encontrados)} não encontrados")
+
+    store = store or open_player_store()
+    # Ficam pendentes de envio: se a planilha não for atualizada agora, o SheetsSync do bot envia depois
+    store.upsert_many(encontrados, dirty=True)
+    if spreadsheet_id:
+        enviados = SheetsSync(store, spreadsheet_id, sheet_name, credentials_file).flush()
+        print(f"✅ {enviados} jogadores enviados para a planilha em um único lote")
+
+    if progress_file and os.path.exists(progress_file):
+        os.remove(progress_file)
+    return len(encontrados)
+
+def main(argv=None):
+    """Linha de comando para popular a base de jogadores em lote."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importa personagens da API da Blizzard para a base de percentis")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--file", help="Arquivo com um personagem por linha (realm,personagem)")
+    origem.add_argument("--guild", nargs=2, metavar=("REALM", "GUILDA"), help="Importa o roster de uma guilda")
+    parser.add_argument("--region", default="us", choices=REGIONS)
+    parser.add_argument("--concurrency", type=int, default=20, help="Personagens buscados em paralelo")
+    parser.add_argument("--progress", default="bulk_import_progress.json", help="Arquivo de progresso (retomada)")
+    parser.add_argument("--no-sheet", action="store_true",
+                        help="Grava só no espelho local; o bot envia à planilha na próxima sincronização")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        characters = read_character_list(args.file)
+    else:
+        async def buscar_roster():
+            client = BlizzardClient(args.region, cache=False)
+            try:
+                return await client.get_guild_roster(*args.guild)
+            finally:
+                await client.close()
+        characters = asyncio.run(buscar_roster())
+    print(f"📋 {len(characters)} personagens para importar")
+
+    bulk_import(
+        characters,
+        region=args.region,
+        progress_file=args.progress,
+        concurrency=args.concurrency,
+        spreadsheet_id=None if args.no_sheet else os.getenv("SPREADSHEET_ID"),
+        sheet_name=os.getenv("SHEET_NAME", "Player_status"),
+        credentials_file=os.getenv("CREDENTIALS_FILE"),
+    )
+
+if __name__ == "__main__":
+    main()